@@ -0,0 +1,105 @@
+import hashlib
+import json
+import mmap
+import struct
+import time
+import numpy as np
+
+# Versioned, mmap-able model artifact.
+#
+# Layout (little-endian):
+#   0   8 bytes   magic b"AQIMODEL"
+#   8   uint32    format version
+#   12  uint32    header length in bytes
+#   16  JSON      header, space-padded so data starts on an ALIGN boundary
+#   ... float32   tensors, each starting on an ALIGN boundary
+#
+# The header records every tensor's offset (relative to the data section)
+# and shape, plus a sha256 of the data section. Loading maps the file
+# read-only and returns NumPy views into it, so worker processes share the
+# same page-cache pages and nothing is unpickled or copied.
+
+MAGIC = b"AQIMODEL"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+_PREFIX = struct.Struct("<8sII")
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def write_artifact(path, tensors, metadata=None):
+    """Write {name: array} as float32 tensors with a JSON header."""
+    entries = {}
+    chunks = []
+    offset = 0
+    for name, array in tensors.items():
+        data = np.ascontiguousarray(array, dtype="<f4").tobytes()
+        entries[name] = {"offset": offset, "shape": list(np.shape(array))}
+        padding = _pad(len(data))
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    payload = b"".join(chunks)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "dtype": "float32",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "metadata": metadata or {},
+        "data_size": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "tensors": entries,
+    }
+
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    header_bytes += b" " * _pad(_PREFIX.size + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+
+    return header
+
+
+def read_header(buf):
+    """Parse (header, data_offset) from the start of an artifact buffer."""
+    magic, version, header_len = _PREFIX.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("Not an AQI model artifact (bad magic)")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact version {version} (expected {FORMAT_VERSION})")
+
+    header = json.loads(bytes(buf[_PREFIX.size:_PREFIX.size + header_len]))
+    return header, _PREFIX.size + header_len
+
+
+def load_artifact(path, verify=True):
+    """
+    Memory-map an artifact and return (header, {name: read-only array view}).
+    With verify=True the data section's sha256 is checked first.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header, data_offset = read_header(mm)
+    data_size = header["data_size"]
+    if data_offset + data_size > len(mm):
+        raise ValueError("Artifact is truncated")
+
+    if verify:
+        digest = hashlib.sha256(memoryview(mm)[data_offset:data_offset + data_size]).hexdigest()
+        if digest != header["sha256"]:
+            raise ValueError(f"Artifact checksum mismatch for {path}")
+
+    tensors = {}
+    for name, entry in header["tensors"].items():
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        tensors[name] = np.frombuffer(
+            mm, dtype="<f4", count=count, offset=data_offset + entry["offset"]
+        ).reshape(shape)
+
+    return header, tensors
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry TTL and LRU eviction.
+
+    - Entries expire `ttl` seconds after they are stored
+    - When `maxsize` is reached the least recently used entry is evicted
+    - get_or_load_async() is single-flight: N concurrent misses for the
+      same key trigger one loader call, the other callers await its result
+    - None results are handed to waiting callers but never stored; pass
+      `cacheable` to also skip other values (e.g. stale fallbacks)
+    - With `l2` (a SharedCache), misses check the cross-process store before
+      calling the loader and loaded values are written through to it, so one
+      worker's upstream fetch serves every worker; `l2_ttl` (default `ttl`)
+      lets the shared copy outlive the local one
+    """
+    def __init__(self, maxsize=256, ttl=600, name="cache", cacheable=None, l2=None, l2_ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cacheable = cacheable or (lambda value: value is not None)
+        self.l2 = l2
+        self.l2_ttl = ttl if l2_ttl is None else l2_ttl
+
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._async_inflight = {}    # key -> asyncio.Task
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.l2_hits = 0
+
+    def _lookup(self, key, now):
+        """Return (found, value); caller must hold the lock."""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._data[key]
+            return False, None
+
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.l2 is not None:
+            self.l2.delete((self.name, key))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _from_l2(self, key):
+        """Value from the shared store (copied into this cache), or None."""
+        if self.l2 is None:
+            return None
+        value, remaining = self.l2.get_with_ttl((self.name, key))
+        if value is None:
+            return None
+        self.l2_hits += 1
+        self.set(key, value, ttl=min(self.ttl, remaining))
+        return value
+
+    def _store(self, key, value):
+        self.set(key, value)
+        if self.l2 is not None:
+            self.l2.set((self.name, key), value, self.l2_ttl)
+
+    def get_through(self, key, default=None):
+        """get() that falls back to the shared store on a local miss."""
+        value = self.get(key)
+        if value is None:
+            value = self._from_l2(key)
+        return default if value is None else value
+
+    def set_through(self, key, value):
+        """set() that also writes the value to the shared store."""
+        self._store(key, value)
+
+    async def _load_async(self, key, loader):
+        try:
+            # Shared-store I/O can wait on SQLite locks: keep it off the loop
+            value = await asyncio.to_thread(self._from_l2, key) if self.l2 is not None else None
+            if value is None:
+                value = await loader()
+                if self.cacheable(value):
+                    if self.l2 is not None:
+                        await asyncio.to_thread(self._store, key, value)
+                    else:
+                        self._store(key, value)
+            return value
+        finally:
+            self._async_inflight.pop(key, None)
+
+    async def get_or_load_async(self, key, loader):
+        """Return the cached value for key, awaiting loader() once on a miss."""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+
+            task = self._async_inflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+
+        if task is None:
+            # The load is its own task, not part of the first caller, so
+            # cancelling any caller (the first one included) leaves it running
+            task = asyncio.ensure_future(self._load_async(key, loader))
+            self._async_inflight[key] = task
+            # retrieve the error so a load nobody awaits anymore isn't logged
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+            inflight = len(self._async_inflight)
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "l2_hits": self.l2_hits,
+            "inflight": inflight,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
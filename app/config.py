@@ -1,6 +1,158 @@
 import os
+import tempfile
+from dotenv import load_dotenv
+
+# The only place .env is read; every other module imports its settings from here
+load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 DATA_DIR = os.path.join(BASE_DIR, "data")
 MODEL_PATH = os.path.join(BASE_DIR, "model", "nbeats_aqi.pth")
+
+# ---------------- DATABASE ----------------
+# Optional; app.database connects lazily on first use
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# ---------------- UPSTREAM CACHE ----------------
+# OpenWeather air-pollution data only changes about once an hour
+OPENWEATHER_CACHE_TTL = int(os.getenv("OPENWEATHER_CACHE_TTL", "600"))
+OPENWEATHER_CACHE_SIZE = int(os.getenv("OPENWEATHER_CACHE_SIZE", "1024"))
+
+# Daily forecast aggregates use local dates (Asia/Kolkata is UTC+5:30)
+FORECAST_UTC_OFFSET_MINUTES = int(os.getenv("FORECAST_UTC_OFFSET_MINUTES", "330"))
+
+# ---------------- UPSTREAM HTTP ----------------
+# Point these at benchmarks/fake_upstream.py for load tests
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5").rstrip("/")
+WAQI_BASE_URL = os.getenv("WAQI_BASE_URL", "https://api.waqi.info").rstrip("/")
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+
+# ---------------- UPSTREAM GUARD ----------------
+# app/guard.py: quota limiter + circuit breaker + last-known-good fallback.
+# OpenWeather's free plan allows 60 calls/minute; cached hits don't count.
+OPENWEATHER_RATE_PER_SEC = float(os.getenv("OPENWEATHER_RATE_PER_SEC", "1"))
+OPENWEATHER_BURST = int(os.getenv("OPENWEATHER_BURST", "60"))
+# Longest a request waits for a quota token before falling back to stale data
+OPENWEATHER_RATE_WAIT = float(os.getenv("OPENWEATHER_RATE_WAIT", "1"))
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Serve the last known good value if a live call takes longer than this
+STALE_AFTER_SECONDS = float(os.getenv("STALE_AFTER_SECONDS", "2"))
+# How long last known good values are kept
+STALE_TTL = int(os.getenv("STALE_TTL", "86400"))
+
+# ---------------- BACKGROUND REFRESH ----------------
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "1") == "1"
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "900"))
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "60"))
+# Snapshot entries older than this are ignored and the request goes live
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "3600"))
+# Also write each refresh to the database (db_manager.update_all_cities_db)
+REFRESH_DB_ENABLED = os.getenv("REFRESH_DB_ENABLED", "0") == "1"
+
+# ---------------- WAQI ----------------
+# Shared limiter for all WAQI calls (replaces fixed sleeps between requests)
+WAQI_RATE_PER_SEC = float(os.getenv("WAQI_RATE_PER_SEC", "2"))
+WAQI_BURST = int(os.getenv("WAQI_BURST", "4"))
+# The nearest-station search queues candidates behind the limiter
+WAQI_RATE_WAIT = float(os.getenv("WAQI_RATE_WAIT", "10"))
+NEAREST_SEARCH_WORKERS = int(os.getenv("NEAREST_SEARCH_WORKERS", "4"))
+# How many of the closest stations get probed before giving up
+NEAREST_SEARCH_CANDIDATES = int(os.getenv("NEAREST_SEARCH_CANDIDATES", "20"))
+
+# ---------------- DB HISTORY CACHE ----------------
+# Read-through cache for db_manager.get_cities_history; writes invalidate it
+HISTORY_CACHE_TTL = int(os.getenv("HISTORY_CACHE_TTL", "3600"))
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "256"))
+# With the shared cache on, HISTORY_CACHE_TTL applies to the shared copy and
+# each worker keeps its own for only this long, so a write made by any worker
+# is seen everywhere within a few seconds
+HISTORY_CACHE_LOCAL_TTL = int(os.getenv("HISTORY_CACHE_LOCAL_TTL", "5"))
+
+# ---------------- HOURLY HISTORY ----------------
+# /history with resolution=auto picks the finest of hour/day/week that
+# returns at most this many points
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))
+
+# ---------------- GPS CACHE ----------------
+# /predict/gps snaps coordinates to a grid; all requests in a cell share
+# one upstream fetch. 0.05° is roughly 5.5 km. Set to 0 to disable snapping.
+GPS_CELL_SIZE_DEG = float(os.getenv("GPS_CELL_SIZE_DEG", "0.05"))
+GPS_CACHE_TTL = int(os.getenv("GPS_CACHE_TTL", "600"))
+GPS_CACHE_SIZE = int(os.getenv("GPS_CACHE_SIZE", "4096"))
+
+# ---------------- MODEL ----------------
+# nbeats_aqi.pth is a pickled nbeats_pytorch module; the runner loads the
+# remappable state dict instead (see NBeatsAQIModel.load_state_dict)
+MODEL_STATE_PATH = os.getenv(
+    "MODEL_STATE_PATH", os.path.join(BASE_DIR, "model", "nbeats_state_dict.pth")
+)
+# Torch-free weights written by export_numpy.py
+MODEL_NPZ_PATH = os.getenv(
+    "MODEL_NPZ_PATH", os.path.join(BASE_DIR, "model", "nbeats_weights.npz")
+)
+# Versioned, mmap-able artifact written by `convert_model.py artifact`
+MODEL_ARTIFACT_PATH = os.getenv(
+    "MODEL_ARTIFACT_PATH", os.path.join(BASE_DIR, "model", "nbeats_aqi.aqim")
+)
+MODEL_ENABLED = os.getenv("MODEL_ENABLED", "1") == "1"
+# "numpy" (no torch import; prefers MODEL_ARTIFACT_PATH, then MODEL_NPZ_PATH),
+# "torch", or "torch-int8" (dynamic int8 Linear weights, CPU only; see
+# benchmarks/quantization_report.py for the accuracy/latency trade-off)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "numpy")
+MODEL_INPUT_SIZE = 30
+# Where model input windows come from: "csv" (in-memory store built from
+# data/*.csv and extended by the refresher) or "db" (aqi_records)
+MODEL_HISTORY_SOURCE = os.getenv("MODEL_HISTORY_SOURCE", "csv")
+# How missing days are filled in the history store: ffill, linear or nan
+HISTORY_GAP_POLICY = os.getenv("HISTORY_GAP_POLICY", "ffill")
+# A model window is only used if it has at least this many real readings,
+# no filled run longer than HISTORY_MAX_GAP_DAYS, and its last real reading
+# is at most HISTORY_MAX_AGE_DAYS old; otherwise the fallback is upstream-based
+HISTORY_MIN_OBSERVED = int(os.getenv("HISTORY_MIN_OBSERVED", "20"))
+HISTORY_MAX_GAP_DAYS = int(os.getenv("HISTORY_MAX_GAP_DAYS", "7"))
+HISTORY_MAX_AGE_DAYS = int(os.getenv("HISTORY_MAX_AGE_DAYS", "2"))
+MODEL_MAX_BATCH = int(os.getenv("MODEL_MAX_BATCH", "64"))
+MODEL_MAX_WAIT_MS = float(os.getenv("MODEL_MAX_WAIT_MS", "5"))
+# Evaluate all six blocks as stacked batched matmuls (FusedNBeatsAQIModel)
+MODEL_FUSED = os.getenv("MODEL_FUSED", "1") == "1"
+
+# ---------------- HTTP CACHING ----------------
+# OpenWeather publishes a new observation per location about once an hour;
+# Cache-Control max-age never runs past the next expected update
+OPENWEATHER_UPDATE_INTERVAL = int(os.getenv("OPENWEATHER_UPDATE_INTERVAL", "3600"))
+# ETags remembered per resource so If-None-Match can 304 without recomputing
+ETAG_CACHE_SIZE = int(os.getenv("ETAG_CACHE_SIZE", "4096"))
+
+# ---------------- WORKERS ----------------
+# uvicorn worker processes started by `python main.py`
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+# SQLite WAL store shared by all workers (L2 behind the in-process caches,
+# refresher snapshot). On by default whenever there is more than one worker.
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1" if WEB_WORKERS > 1 else "0") == "1"
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "aqi_shared_cache.db"))
+# flock'd by the one worker that runs the refresher
+REFRESH_LOCK_PATH = os.getenv("REFRESH_LOCK_PATH", SHARED_CACHE_PATH + ".refresh.lock")
+# How often non-leader workers copy the leader's snapshot from the shared store
+SNAPSHOT_SYNC_INTERVAL = float(os.getenv("SNAPSHOT_SYNC_INTERVAL", "5"))
+# The OPENWEATHER_/WAQI_ rate and burst settings are totals for the whole
+# deployment; every worker runs its own limiter with an equal share
+OPENWEATHER_WORKER_RATE = OPENWEATHER_RATE_PER_SEC / WEB_WORKERS
+OPENWEATHER_WORKER_BURST = max(1, OPENWEATHER_BURST // WEB_WORKERS)
+WAQI_WORKER_RATE = WAQI_RATE_PER_SEC / WEB_WORKERS
+WAQI_WORKER_BURST = max(1, WAQI_BURST // WEB_WORKERS)
+
+# ---------------- STREAMING ----------------
+# /stream/cities (SSE) and /ws/cities push refresher updates on change.
+# Per-connection buffer; a slow client loses the oldest updates first.
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+# Keep-alive comment/ping so proxies don't cut idle streams
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+# ---------------- OBSERVABILITY ----------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -1,32 +1,114 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, Float
+from sqlalchemy import (
+    create_engine, inspect, text, Column, Integer, String, Date, DateTime, Float, Index, PrimaryKeyConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-import sys
-from dotenv import load_dotenv
+import threading
+from app.config import DATABASE_URL as _CONFIGURED_URL
+from app.log import get_logger
 
-load_dotenv()
+logger = get_logger("database")
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# ❌ Check if DATABASE_URL is set
-if not DATABASE_URL:
-    print("❌ ERROR: DATABASE_URL environment variable not set!")
-    sys.exit(1)
+# Nothing here connects on import: the engine is created (and the tables
+# checked) by the first get_engine() call, normally the startup warm-up.
+DATABASE_URL = _CONFIGURED_URL
 
 # ✅ Fix old postgres:// format
-if DATABASE_URL.startswith("postgres://"):
+if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+IS_SQLITE = bool(DATABASE_URL) and DATABASE_URL.startswith("sqlite")
+
 # ✅ IMPORTANT: Add SSL for Render/Railway
-if "sslmode" not in DATABASE_URL:
+if DATABASE_URL and not IS_SQLITE and "sslmode" not in DATABASE_URL:
     DATABASE_URL += "?sslmode=require"
 
-print("✅ Connecting to database...")
+# ✅ Session (bound to the engine once it exists)
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+)
+
+# ✅ Base model
+Base = declarative_base()
+
+# ✅ Table model
+class AQIRecord(Base):
+    __tablename__ = "aqi_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False, index=True)
+    city = Column(String, nullable=False, index=True)
+    aqi = Column(Float, nullable=False)
+    source = Column(String, nullable=False)
+
+    # One row per city per day; target of INSERT ... ON CONFLICT upserts
+    __table_args__ = (
+        Index("uq_aqi_records_city_date", "city", "date", unique=True),
+    )
+
+
+# ✅ Hourly time series + rollups (app/timeseries.py maintains them)
+class AQIHourly(Base):
+    """One reading per city per hour; ts is the UTC hour (naive datetime)."""
+    __tablename__ = "aqi_hourly"
+
+    city = Column(String, nullable=False)
+    ts = Column(DateTime, nullable=False)
+    aqi = Column(Float, nullable=False)
+    source = Column(String, nullable=False)
+
+    # Composite (city, ts) key: the index every range query and upsert uses
+    __table_args__ = (
+        PrimaryKeyConstraint("city", "ts", name="pk_aqi_hourly"),
+    )
+
+
+class AQIDaily(Base):
+    """Per-city daily rollup of aqi_hourly (UTC days)."""
+    __tablename__ = "aqi_daily"
+
+    city = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
 
-try:
+    __table_args__ = (
+        PrimaryKeyConstraint("city", "day", name="pk_aqi_daily"),
+    )
+
+
+class AQIWeekly(Base):
+    """Per-city weekly rollup of aqi_daily; week_start is the Monday."""
+    __tablename__ = "aqi_weekly"
+
+    city = Column(String, nullable=False)
+    week_start = Column(Date, nullable=False)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("city", "week_start", name="pk_aqi_weekly"),
+    )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _create_engine():
+    if IS_SQLITE:
+        # Local/testing fallback, e.g. DATABASE_URL=sqlite:///aqi.db
+        return create_engine(
+            DATABASE_URL,
+            connect_args={"check_same_thread": False}
+        )
     # ✅ FIXED ENGINE (handles dropped connections)
-    engine = create_engine(
+    return create_engine(
         DATABASE_URL,
         pool_pre_ping=True,   # reconnect if connection is dead
         pool_recycle=300,     # refresh connection every 5 mins
@@ -34,39 +116,64 @@ try:
         max_overflow=10
     )
 
-    # ✅ Session
-    SessionLocal = sessionmaker(
-        autocommit=False,
-        autoflush=False,
-        bind=engine
-    )
 
-    # ✅ Base model
-    Base = declarative_base()
+def init_db(engine):
+    """Create missing tables and indexes."""
+    # ✅ Create tables (only if not exists)
+    Base.metadata.create_all(bind=engine)
 
-    # ✅ Table model
-    class AQIRecord(Base):
-        __tablename__ = "aqi_records"
+    # create_all skips indexes on tables that already exist. Older tables
+    # may hold several rows per (city, date); keep the newest (highest id)
+    # so the unique index behind the ON CONFLICT upserts can be built.
+    # Any failure here propagates: without that index every write fails.
+    table = AQIRecord.__table__
+    with engine.begin() as conn:
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                removed = conn.execute(text(
+                    "DELETE FROM aqi_records WHERE id NOT IN "
+                    "(SELECT MAX(id) FROM aqi_records GROUP BY city, date)"
+                )).rowcount
+                if removed:
+                    logger.warning("⚠️ Removed %s duplicate (city, date) rows before creating %s", removed, index.name)
+            index.create(bind=conn)
 
-        id = Column(Integer, primary_key=True, index=True)
-        date = Column(Date, nullable=False, index=True)
-        city = Column(String, nullable=False, index=True)
-        aqi = Column(Float, nullable=False)
-        source = Column(String, nullable=False)
 
-    # ✅ Create tables (only if not exists)
-    Base.metadata.create_all(bind=engine)
+def get_engine():
+    """
+    The process-wide engine, connected and initialized on first use.
 
-    print("✅ Database connected successfully")
+    Raises RuntimeError when DATABASE_URL is not set and lets connection
+    errors propagate; a later call retries.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL environment variable not set")
+                logger.info("✅ Connecting to database...")
+                engine = _create_engine()
+                try:
+                    init_db(engine)
+                except Exception as e:
+                    engine.dispose()
+                    logger.error("❌ Database connection failed: %s", e)
+                    raise
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+                logger.info("✅ Database connected successfully")
+    return _engine
 
-except Exception as e:
-    print(f"❌ Database connection failed: {e}")
-    sys.exit(1)
 
 # ✅ Dependency for FastAPI
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
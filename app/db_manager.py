@@ -1,9 +1,21 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from sqlalchemy import desc
-from app.database import SessionLocal, AQIRecord
-from app.waqi import fetch_city_aqi
-from math import radians, cos, sin, asin, sqrt
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.cache import TTLCache
+from app.config import (
+    NEAREST_SEARCH_WORKERS, NEAREST_SEARCH_CANDIDATES, HISTORY_CACHE_TTL, HISTORY_CACHE_SIZE,
+    HISTORY_CACHE_LOCAL_TTL,
+)
+from app.database import AQIRecord, get_engine
+from app.waqi import fetch_city_aqi, fetch_city_reading
+from app.geo import StationIndex
+from app.log import get_logger
+from app.metrics import cache_collector, register_collector, span
+from app.shared_cache import get_shared_cache
+
+logger = get_logger("db_manager")
 
 CITY_COORDS = {
     "Chennai": (13.0827, 80.2707),
@@ -23,12 +35,19 @@ CITY_COORDS = {
     "Ooty": (11.4102, 76.6950)
 }
 
-def haversine(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
-    return 6371 * 2 * asin(sqrt(a))
+CITY_INDEX = StationIndex(CITY_COORDS)
+
+# city -> (days fetched, tuple of AQI values oldest first). With the shared
+# cache every worker reads one copy and a write's invalidation reaches them all
+_history_l2 = get_shared_cache()
+_history_cache = TTLCache(
+    maxsize=HISTORY_CACHE_SIZE,
+    ttl=HISTORY_CACHE_LOCAL_TTL if _history_l2 is not None else HISTORY_CACHE_TTL,
+    name="history",
+    l2=_history_l2,
+    l2_ttl=HISTORY_CACHE_TTL,
+)
+register_collector(cache_collector(_history_cache))
 
 def is_valid_aqi(aqi):
     if aqi is None:
@@ -42,92 +61,169 @@ def is_valid_aqi(aqi):
         return False
 
 def get_nearest_valid_city(city):
+    """
+    Find the closest other city with a valid WAQI reading.
+
+    The NEAREST_SEARCH_CANDIDATES closest stations (from the spatial index)
+    are probed concurrently in distance order (WAQI rate limiting is handled
+    by waqi_guard). The search stops at the first candidate, in distance
+    order, that returns a valid AQI.
+    """
     lat, lon = CITY_COORDS[city]
-    distances = []
+    candidates = CITY_INDEX.k_nearest(lat, lon, NEAREST_SEARCH_CANDIDATES, exclude={city})
+
+    pool = ThreadPoolExecutor(max_workers=NEAREST_SEARCH_WORKERS)
+    try:
+        futures = [pool.submit(fetch_city_aqi, other) for other, _ in candidates]
+
+        for (other, dist), future in zip(candidates, futures):
+            try:
+                aqi = future.result()
+            except Exception as e:
+                logger.warning("⚠️ Probe failed for %s: %s", other, e)
+                continue
+            if is_valid_aqi(aqi):
+                return other, int(aqi)
+    finally:
+        # Don't wait for farther probes once the nearest valid one is known
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    raise ValueError("No nearby AQI stations available")
+
+def read_city_reading(city: str):
+    """Fetch today's reading for a city as an aqi_records row dict"""
+    aqi, stale = fetch_city_reading(city)
+    # A stale reading is WAQI's last good value, served while it is unavailable
+    source = "direct:stale" if stale else "direct"
 
-    for other, (olat, olon) in CITY_COORDS.items():
-        if other == city:
-            continue
-        aqi = fetch_city_aqi(other)
-        if is_valid_aqi(aqi):
-            dist = haversine(lat, lon, olat, olon)
-            distances.append((dist, other, int(aqi)))
-        time.sleep(0.5)
+    if not is_valid_aqi(aqi):
+        nearest_city, aqi = get_nearest_valid_city(city)
+        source = f"nearest:{nearest_city}"
 
-    if not distances:
-        raise ValueError("No nearby AQI stations available")
+    return {"date": date.today(), "city": city, "aqi": int(aqi), "source": source}
 
-    distances.sort()
-    return distances[0][1], distances[0][2]
+def collect_city_readings(cities=None):
+    """Fetch readings for many cities concurrently; failed cities are skipped"""
+    cities = list(CITY_COORDS) if cities is None else list(cities)
+    rows = []
+
+    with ThreadPoolExecutor(max_workers=NEAREST_SEARCH_WORKERS) as pool:
+        futures = {city: pool.submit(read_city_reading, city) for city in cities}
+        for city, future in futures.items():
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                logger.error("❌ Failed: %s | %s", city, e)
+
+    return rows
+
+def bulk_upsert_records(rows):
+    """
+    Write rows into aqi_records in a single transaction using
+    INSERT ... ON CONFLICT (city, date) DO UPDATE (Postgres or SQLite).
+    """
+    # Postgres rejects a statement that touches the same key twice
+    deduped = {(r["city"], r["date"]): r for r in rows}
+    if not deduped:
+        return 0
+
+    engine = get_engine()
+    insert = sqlite_insert if engine.dialect.name == "sqlite" else pg_insert
+    stmt = insert(AQIRecord.__table__).values(list(deduped.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["city", "date"],
+        set_={"aqi": stmt.excluded.aqi, "source": stmt.excluded.source},
+    )
+
+    with span("db_write"), engine.begin() as conn:
+        conn.execute(stmt)
+
+    for city, _ in deduped:
+        _history_cache.invalidate(city)
+
+    return len(deduped)
 
 def update_city_db(city: str):
     """Update AQI record in database"""
-    db = SessionLocal()
     try:
-        aqi = fetch_city_aqi(city)
-        source = "direct"
-
-        if not is_valid_aqi(aqi):
-            nearest_city, aqi = get_nearest_valid_city(city)
-            source = f"nearest:{nearest_city}"
-
-        today = date.today()
-        
-        # Check if record exists for today
-        existing = db.query(AQIRecord).filter(
-            AQIRecord.city == city,
-            AQIRecord.date == today
-        ).first()
-        
-        if existing:
-            # Update existing record
-            existing.aqi = int(aqi)
-            existing.source = source
-            print(f"✅ Updated DB for {city}: AQI={aqi}")
-        else:
-            # Create new record
-            record = AQIRecord(
-                date=today,
-                city=city,
-                aqi=int(aqi),
-                source=source
-            )
-            db.add(record)
-            print(f"✅ Added new record for {city}: AQI={aqi}")
-        
-        db.commit()
-        
+        row = read_city_reading(city)
+        bulk_upsert_records([row])
+        logger.info("✅ Upserted DB for %s: AQI=%s", city, row["aqi"])
     except Exception as e:
-        print(f"❌ Failed to update {city}: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        logger.error("❌ Failed to update %s: %s", city, e)
 
 def update_all_cities_db():
     """Update all cities in database"""
-    print("🔄 Updating AQI for all cities in database...")
-    
-    for city in CITY_COORDS:
-        try:
-            update_city_db(city)
-            time.sleep(1)
-        except Exception as e:
-            print(f"❌ Failed: {city} | {e}")
-    
-    print("✅ AQI database update completed.")
+    logger.info("🔄 Updating AQI for all cities in database...")
+
+    rows = collect_city_readings()
+    try:
+        written = bulk_upsert_records(rows)
+        logger.info("✅ AQI database update completed: %s/%s cities.", written, len(CITY_COORDS))
+    except Exception as e:
+        logger.error("❌ Bulk update failed: %s", e)
+
+def _query_cities_history(cities, days):
+    """
+    Last `days` rows for every city in one query (ROW_NUMBER() window),
+    returned as plain values without building ORM objects.
+    """
+    table = AQIRecord.__table__
+    rank = func.row_number().over(
+        partition_by=table.c.city,
+        order_by=table.c.date.desc(),
+    ).label("rank")
+
+    ranked = (
+        select(table.c.city, table.c.date, table.c.aqi, rank)
+        .where(table.c.city.in_(cities))
+        .subquery()
+    )
+    stmt = (
+        select(ranked.c.city, ranked.c.aqi)
+        .where(ranked.c.rank <= days)
+        .order_by(ranked.c.city, ranked.c.date)
+    )
+
+    history = {city: [] for city in cities}
+    with span("db_query"), get_engine().connect() as conn:
+        for city, aqi in conn.execute(stmt):
+            history[city].append(aqi)
+
+    return {city: tuple(values) for city, values in history.items()}
+
+def get_cities_history(cities=None, days: int = 30):
+    """
+    Historical AQI for many cities as {city: tuple oldest to newest}.
+    Served from a read-through cache; misses are fetched in one query.
+    """
+    cities = list(CITY_COORDS) if cities is None else list(cities)
+    result = {}
+    missing = []
+
+    for city in cities:
+        entry = _history_cache.get_through(city)
+        if entry is not None and entry[0] >= days:
+            # the shared store hands back JSON lists
+            result[city] = tuple(entry[1][-days:]) if days else ()
+        else:
+            missing.append(city)
+
+    if missing:
+        fetched = _query_cities_history(missing, days)
+        for city, values in fetched.items():
+            _history_cache.set_through(city, (days, values))
+            result[city] = values
+
+    return result
 
 def get_city_history(city: str, days: int = 30):
     """Get historical AQI data from database"""
-    db = SessionLocal()
-    try:
-        records = db.query(AQIRecord).filter(
-            AQIRecord.city == city
-        ).order_by(desc(AQIRecord.date)).limit(days).all()
-        
-        # Return in chronological order (oldest to newest)
-        aqi_values = [r.aqi for r in reversed(records)]
-        
-        print(f"📊 Retrieved {len(aqi_values)} days of history for {city}")
-        return aqi_values
-    finally:
-        db.close()
\ No newline at end of file
+    # Return in chronological order (oldest to newest)
+    aqi_values = list(get_cities_history([city], days)[city])
+
+    logger.debug("📊 Retrieved %s days of history for %s", len(aqi_values), city)
+    return aqi_values
+
+def history_cache_stats():
+    return _history_cache.stats()
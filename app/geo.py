@@ -0,0 +1,101 @@
+import heapq
+from math import radians, cos, sin, asin, sqrt
+
+EARTH_RADIUS_KM = 6371
+
+# Leaves hold a handful of stations; scanning them beats deeper recursion
+_LEAF_SIZE = 8
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
+    return EARTH_RADIUS_KM * 2 * asin(sqrt(a))
+
+
+def to_unit_vector(lat, lon):
+    """(lat, lon) in degrees -> point on the unit sphere."""
+    lat, lon = radians(lat), radians(lon)
+    return (cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat))
+
+
+def chord_to_km(chord):
+    """Straight-line distance between unit vectors -> great-circle km."""
+    return EARTH_RADIUS_KM * 2 * asin(min(1.0, chord / 2))
+
+
+class StationIndex:
+    """
+    KD-tree over unit-sphere coordinates for nearest-station lookups.
+
+    Euclidean (chord) distance between unit vectors increases monotonically
+    with great-circle distance, so the tree answers nearest / k-nearest
+    queries exactly while distances are reported in great-circle km.
+    Build is O(n log n), queries are O(log n) on average.
+    """
+    def __init__(self, stations):
+        """stations: {name: (lat, lon)}"""
+        self.names = list(stations)
+        self.coords = [stations[name] for name in self.names]
+        self.points = [to_unit_vector(lat, lon) for lat, lon in self.coords]
+        self._root = self._build(list(range(len(self.points))))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build(self, idxs):
+        if len(idxs) <= _LEAF_SIZE:
+            return (None, None, idxs, None)
+
+        # Split on the axis with the widest spread
+        points = self.points
+        spreads = [
+            max(points[i][axis] for i in idxs) - min(points[i][axis] for i in idxs)
+            for axis in range(3)
+        ]
+        axis = spreads.index(max(spreads))
+
+        idxs.sort(key=lambda i: points[i][axis])
+        mid = len(idxs) // 2
+        split = points[idxs[mid]][axis]
+        return (axis, split, self._build(idxs[:mid]), self._build(idxs[mid:]))
+
+    def _search(self, node, q, k, heap, exclude):
+        axis, split, left, right = node
+
+        if axis is None:
+            points = self.points
+            for i in left:
+                if exclude is not None and self.names[i] in exclude:
+                    continue
+                p = points[i]
+                d = (p[0] - q[0])**2 + (p[1] - q[1])**2 + (p[2] - q[2])**2
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d, i))
+                elif d < -heap[0][0]:
+                    heapq.heapreplace(heap, (-d, i))
+            return
+
+        diff = q[axis] - split
+        near, far = (left, right) if diff < 0 else (right, left)
+        self._search(near, q, k, heap, exclude)
+        if len(heap) < k or diff * diff < -heap[0][0]:
+            self._search(far, q, k, heap, exclude)
+
+    def k_nearest(self, lat, lon, k, exclude=None):
+        """Return up to k [(name, distance_km)] ordered nearest first."""
+        if k <= 0 or not self.names:
+            return []
+
+        heap = []   # max-heap of (-squared chord, index)
+        self._search(self._root, to_unit_vector(lat, lon), k, heap, exclude)
+
+        results = sorted((-neg_d, i) for neg_d, i in heap)
+        return [(self.names[i], chord_to_km(sqrt(d))) for d, i in results]
+
+    def nearest(self, lat, lon, exclude=None):
+        """Return (name, distance_km) of the closest station, or (None, None)."""
+        found = self.k_nearest(lat, lon, 1, exclude=exclude)
+        return found[0] if found else (None, None)
@@ -0,0 +1,258 @@
+import asyncio
+import threading
+import time
+from app.cache import TTLCache
+from app.ratelimit import TokenBucket
+from app.log import get_logger
+
+logger = get_logger("guard")
+
+
+class UpstreamUnavailable(Exception):
+    """No fresh value could be fetched and no last known good value exists."""
+    def __init__(self, name, reason):
+        super().__init__(f"{name} unavailable: {reason}")
+        self.name = name
+        self.reason = reason
+
+
+class UpstreamClientError(Exception):
+    """
+    The upstream rejected the request itself (4xx other than 429), e.g. an
+    invalid coordinate. Says nothing about upstream health: it neither
+    counts as a breaker failure nor falls back to a stale value.
+    """
+    def __init__(self, name, status, detail=""):
+        super().__init__(f"{name} rejected the request ({status}): {detail}")
+        self.name = name
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    - closed: calls go through; `failure_threshold` failures in a row open it
+    - open: calls are refused for `reset_timeout` seconds
+    - half-open: one probe call is let through; success closes the breaker,
+      failure opens it again
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name="breaker"):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.refused = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """True if a call may go upstream now."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.refused += 1
+            return False
+
+    def release(self):
+        """Give back a half-open probe slot that was not used."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("✅ Circuit %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._probing
+            self._probing = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning("⚠️ Circuit %s open after %s failures", self.name, self._failures)
+
+    def stats(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            failures = self._failures
+        return {
+            "name": self.name,
+            "state": state,
+            "consecutive_failures": failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "opened": self.opened,
+            "refused": self.refused,
+        }
+
+
+class UpstreamGuard:
+    """
+    Rate limiter + circuit breaker + last-known-good store for one upstream.
+
+    call()/call_async() return (value, stale). A fresh value (fetch returned
+    non-None) is remembered per key; when the breaker is open, no token is
+    available within `max_wait` seconds, or the fetch fails, the last known
+    good value is returned with stale=True instead. UpstreamUnavailable is
+    raised if there is none. A fetch raising UpstreamClientError (a bad
+    request, not an upstream fault) propagates untouched. The async variant also serves the stale value
+    when the fetch takes longer than `stale_after` seconds, letting the fetch
+    finish in the background to revalidate; its value is then passed to
+    `on_revalidate(key, value)` so callers can refresh their own cache.
+    """
+    def __init__(self, name, rate, burst, max_wait=1.0, failure_threshold=5,
+                 reset_timeout=30.0, stale_after=None, stale_ttl=86400, stale_size=1024,
+                 on_revalidate=None):
+        self.name = name
+        self.on_revalidate = on_revalidate
+        self.max_wait = max_wait
+        self.stale_after = stale_after
+        self.limiter = TokenBucket(rate, burst, name=name)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, name=name)
+        self._last_good = TTLCache(maxsize=stale_size, ttl=stale_ttl, name=f"{name}_last_good")
+
+        self.fresh = 0
+        self.stale_served = 0
+        self.unavailable = 0
+        self.client_errors = 0
+
+    def _record(self, key, value):
+        if value is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            self._last_good.set(key, value)
+        return value
+
+    def _stale(self, key, reason):
+        value = self._last_good.get(key)
+        if value is None:
+            self.unavailable += 1
+            raise UpstreamUnavailable(self.name, reason)
+        self.stale_served += 1
+        logger.debug("♻️ Serving stale %s value for %s (%s)", self.name, key, reason)
+        return value, True
+
+    def call(self, key, fetch):
+        """Run fetch() (blocking) under the guard."""
+        if not self.breaker.allow():
+            return self._stale(key, "circuit_open")
+        if not self.limiter.acquire(timeout=self.max_wait):
+            self.breaker.release()
+            return self._stale(key, "rate_limited")
+
+        try:
+            value = self._record(key, fetch())
+        except UpstreamClientError:
+            self.breaker.release()
+            self.client_errors += 1
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            return self._stale(key, "error")
+        if value is None:
+            return self._stale(key, "bad_response")
+        self.fresh += 1
+        return value, False
+
+    async def _fetch_and_record(self, key, fetch):
+        try:
+            return self._record(key, await fetch())
+        except UpstreamClientError:
+            self.breaker.release()
+            self.client_errors += 1
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+    def _revalidated(self, key, task):
+        """A fetch that outlived stale_after finished in the background."""
+        # Retrieving the error also keeps it from being logged as unhandled
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        if value is not None and self.on_revalidate is not None:
+            self.on_revalidate(key, value)
+
+    async def call_async(self, key, fetch):
+        """Async variant of call(); fetch is a coroutine function."""
+        if not self.breaker.allow():
+            return self._stale(key, "circuit_open")
+        if not await self.limiter.acquire_async(timeout=self.max_wait):
+            self.breaker.release()
+            return self._stale(key, "rate_limited")
+
+        task = asyncio.ensure_future(self._fetch_and_record(key, fetch))
+        if self.stale_after is not None and self._last_good.get(key) is not None:
+            done, _ = await asyncio.wait({task}, timeout=self.stale_after)
+            if not done:
+                task.add_done_callback(lambda t: self._revalidated(key, t))
+                return self._stale(key, "slow")
+
+        try:
+            value = await task
+        except (asyncio.CancelledError, UpstreamClientError):
+            raise
+        except Exception:
+            return self._stale(key, "error")
+        if value is None:
+            return self._stale(key, "bad_response")
+        self.fresh += 1
+        return value, False
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "fresh": self.fresh,
+            "stale_served": self.stale_served,
+            "unavailable": self.unavailable,
+            "client_errors": self.client_errors,
+            "last_good_entries": self._last_good.stats()["size"],
+            "limiter": self.limiter.stats(),
+            "breaker": self.breaker.stats(),
+        }
+
+
+def guard_collector(*guards):
+    """Metrics collector exposing breaker state and stale/unavailable counts."""
+    states = ("closed", "half_open", "open")
+
+    def collect():
+        stats = [guard.stats() for guard in guards]
+        return [
+            ("aqi_upstream_guard_results_total", "counter", "Guarded upstream calls by outcome",
+             [({"upstream": s["name"], "result": result}, s[result])
+              for s in stats for result in ("fresh", "stale_served", "unavailable", "client_errors")]),
+            ("aqi_upstream_rate_limited_total", "counter", "Calls refused by the upstream rate limiter",
+             [({"upstream": s["name"]}, s["limiter"]["rejected"]) for s in stats]),
+            ("aqi_upstream_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+             [({"upstream": s["name"]}, states.index(s["breaker"]["state"])) for s in stats]),
+        ]
+    return collect
@@ -0,0 +1,233 @@
+import csv
+import glob
+import os
+import threading
+from datetime import date
+import numpy as np
+from app.config import (
+    DATA_DIR, MODEL_INPUT_SIZE, HISTORY_GAP_POLICY,
+    HISTORY_MIN_OBSERVED, HISTORY_MAX_GAP_DAYS, HISTORY_MAX_AGE_DAYS,
+)
+from app.log import get_logger
+
+logger = get_logger("history")
+
+# In-memory daily AQI history, one contiguous float32 array per city.
+#
+# Index i of a city's array is day (start + i), so lookups by date are
+# O(1) and any run of days is a slice. Missing days are filled when a
+# later reading arrives, according to the gap policy:
+#   "ffill"  - repeat the last observed value
+#   "linear" - interpolate between the readings on either side of the gap
+#   "nan"    - leave NaN (windows containing NaN are reported as unusable)
+
+GAP_POLICIES = ("ffill", "linear", "nan")
+
+
+def _longest_gap(observed):
+    """Longest run of filled (unobserved) days in a mask."""
+    longest = run = 0
+    for seen in observed:
+        run = 0 if seen else run + 1
+        longest = max(longest, run)
+    return longest
+
+
+class CityHistory:
+    """Daily series for one city backed by a growable buffer."""
+    def __init__(self, start, capacity=64):
+        self.start = start.toordinal()
+        self.length = 0
+        self._values = np.full(capacity, np.nan, dtype=np.float32)
+        self._observed = np.zeros(capacity, dtype=bool)
+
+    @property
+    def values(self):
+        """View of all days (observed and filled), oldest first."""
+        return self._values[:self.length]
+
+    @property
+    def observed(self):
+        """View of the mask of days that had a real reading."""
+        return self._observed[:self.length]
+
+    @property
+    def last_date(self):
+        return date.fromordinal(self.start + self.length - 1) if self.length else None
+
+    def _grow(self, needed):
+        capacity = len(self._values)
+        while capacity < needed:
+            capacity *= 2
+        values = np.full(capacity, np.nan, dtype=np.float32)
+        observed = np.zeros(capacity, dtype=bool)
+        values[:self.length] = self._values[:self.length]
+        observed[:self.length] = self._observed[:self.length]
+        self._values, self._observed = values, observed
+
+    def _fill(self, lo, hi, policy):
+        """Fill unobserved days in [lo, hi) from the observed days around them."""
+        if hi <= lo or policy == "nan":
+            return
+
+        prev = lo - 1
+        if prev < 0:
+            return
+        left = self._values[prev]
+
+        if policy == "linear" and hi < self.length and self._observed[hi]:
+            right = self._values[hi]
+            steps = np.arange(1, hi - lo + 1, dtype=np.float32) / (hi - prev)
+            self._values[lo:hi] = left + (right - left) * steps
+        else:
+            self._values[lo:hi] = left
+
+    def set(self, day, aqi, policy):
+        """
+        Record a reading. Appending the next day is O(1) amortized; days
+        before the first one are ignored.
+        """
+        idx = day.toordinal() - self.start
+        if idx < 0:
+            return False
+
+        if idx >= len(self._values):
+            self._grow(idx + 1)
+
+        old_length = self.length
+        self.length = max(self.length, idx + 1)
+        self._values[idx] = aqi
+        self._observed[idx] = True
+
+        # Re-fill the unobserved run before this day ...
+        lo = idx
+        while lo > 0 and not self._observed[lo - 1]:
+            lo -= 1
+        self._fill(lo, idx, policy)
+
+        # ... and after it, if this was a correction inside the series
+        if idx + 1 < old_length:
+            hi = idx + 1
+            while hi < self.length and not self._observed[hi]:
+                hi += 1
+            self._fill(idx + 1, hi, policy)
+
+        return True
+
+    def window(self, size, end=None):
+        """
+        Zero-copy view of `size` days ending at `end` (inclusive, default
+        the latest day), or None if there isn't enough history.
+        The view reflects later in-place writes but not buffer growth.
+        """
+        stop = self.length if end is None else end.toordinal() - self.start + 1
+        if stop > self.length or stop - size < 0:
+            return None
+        return self._values[stop - size:stop]
+
+    def observed_window(self, size, end=None):
+        """Observed-day mask matching window(size, end), or None."""
+        stop = self.length if end is None else end.toordinal() - self.start + 1
+        if stop > self.length or stop - size < 0:
+            return None
+        return self._observed[stop - size:stop]
+
+
+class HistoryStore:
+    """Per-city CityHistory arrays, loaded from data/*.csv."""
+    def __init__(self, gap_policy=HISTORY_GAP_POLICY):
+        if gap_policy not in GAP_POLICIES:
+            raise ValueError(f"Unknown gap policy: {gap_policy}")
+        self.gap_policy = gap_policy
+        self._cities = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv_dir(cls, data_dir=DATA_DIR, gap_policy=HISTORY_GAP_POLICY):
+        """Load every <City>.csv (columns city, date, ..., aqi, source)."""
+        store = cls(gap_policy)
+        for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+            with open(path, newline="") as f:
+                rows = [
+                    (date.fromisoformat(r["date"]), r["city"], float(r["aqi"]))
+                    for r in csv.DictReader(f)
+                    if r.get("date") and r.get("aqi")
+                ]
+            for day, city, aqi in sorted(rows):
+                store.append(city, day, aqi)
+        return store
+
+    def append(self, city, day, aqi):
+        """Record one daily reading; later readings for a day replace earlier ones."""
+        with self._lock:
+            history = self._cities.get(city)
+            if history is None:
+                history = self._cities[city] = CityHistory(day)
+            return history.set(day, aqi, self.gap_policy)
+
+    def get(self, city):
+        return self._cities.get(city)
+
+    def window(self, city, size=MODEL_INPUT_SIZE, end=None):
+        """Last `size` days for a city as a zero-copy view, or None."""
+        history = self._cities.get(city)
+        if history is None:
+            return None
+        return history.window(size, end)
+
+    def model_window(self, city, size=MODEL_INPUT_SIZE, today=None):
+        """
+        Latest window if it is fit for the model, else None: enough real
+        readings (HISTORY_MIN_OBSERVED), no filled run longer than
+        HISTORY_MAX_GAP_DAYS, last reading within HISTORY_MAX_AGE_DAYS.
+        """
+        history = self._cities.get(city)
+        if history is None:
+            return None
+        window = history.window(size)
+        if window is None or np.isnan(window).any():
+            return None
+
+        today = today or date.today()
+        age = (today - history.last_date).days
+        observed = history.observed_window(size)
+        count = int(observed.sum())
+        gap = _longest_gap(observed)
+        if age > HISTORY_MAX_AGE_DAYS or count < HISTORY_MIN_OBSERVED or gap > HISTORY_MAX_GAP_DAYS:
+            logger.debug(
+                "Unusable window for %s: %s days old, %s/%s observed, longest gap %s",
+                city, age, count, size, gap,
+            )
+            return None
+        return window
+
+    def cities(self):
+        return list(self._cities)
+
+    def stats(self):
+        return {
+            "gap_policy": self.gap_policy,
+            "cities": {
+                city: {
+                    "days": h.length,
+                    "observed": int(h.observed.sum()),
+                    "last_date": h.last_date.isoformat() if h.last_date else None,
+                }
+                for city, h in self._cities.items()
+            },
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Process-wide HistoryStore, loaded from DATA_DIR on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore.from_csv_dir()
+                logger.info("📊 Loaded history for %s cities from %s", len(_store.cities()), DATA_DIR)
+    return _store
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import time
+from fastapi import Response
+from app.cache import TTLCache
+from app.config import (
+    ETAG_CACHE_SIZE, OPENWEATHER_CACHE_TTL, OPENWEATHER_UPDATE_INTERVAL,
+    REFRESH_INTERVAL, REFRESH_JITTER,
+)
+from app.metrics import cache_collector, register_collector
+
+# Response fields that change on every request without the data changing
+VOLATILE_FIELDS = ("snapshot_age_seconds",)
+
+# resource -> (etag, expires_at) for the last response served per resource.
+# Entries live exactly as long as the max-age they were served with, so a
+# matching If-None-Match inside that window is answered without any work.
+_validators = TTLCache(maxsize=ETAG_CACHE_SIZE, ttl=OPENWEATHER_CACHE_TTL, name="etag")
+
+register_collector(cache_collector(_validators))
+
+
+def make_etag(body):
+    """
+    Weak ETag over the response data (observed_at included). Weak because
+    VOLATILE_FIELDS are left out: bodies that differ only in those are
+    semantically equivalent but not byte-identical.
+    """
+    data = {k: v for k, v in body.items() if k not in VOLATILE_FIELDS}
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _opaque(tag):
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def live_max_age(observed_at, stale=False, now=None):
+    """
+    Freshness of a response built from OpenWeather data: until the next
+    expected observation, capped by the upstream cache TTL. Stale fallbacks
+    get 0 so clients revalidate.
+    """
+    if stale:
+        return 0
+    max_age = OPENWEATHER_CACHE_TTL
+    if observed_at is not None:
+        now = time.time() if now is None else now
+        max_age = min(max_age, observed_at + OPENWEATHER_UPDATE_INTERVAL - now)
+    return max(0, int(max_age))
+
+
+def snapshot_max_age(age, observed_at):
+    """Freshness of a snapshot entry: until the earliest possible next refresh."""
+    until_refresh = REFRESH_INTERVAL - REFRESH_JITTER - age
+    return max(0, int(min(until_refresh, live_max_age(observed_at))))
+
+
+def cache_headers(etag, max_age):
+    headers = {"Cache-Control": f"max-age={max_age}" if max_age > 0 else "no-cache"}
+    if etag is not None:
+        headers["ETag"] = etag
+    return headers
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)."""
+    if not if_none_match or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = _opaque(etag)
+    return any(_opaque(tag.strip()) == etag for tag in if_none_match.split(","))
+
+
+def remember(resource, etag, max_age):
+    if max_age > 0:
+        _validators.set(resource, (etag, time.monotonic() + max_age), ttl=max_age)
+
+
+def known_validator(resource):
+    """(etag, remaining max-age) still valid for a resource, or None."""
+    entry = _validators.get(resource)
+    if entry is None:
+        return None
+    etag, expires_at = entry
+    remaining = int(expires_at - time.monotonic())
+    if remaining <= 0:
+        return None
+    return etag, remaining
+
+
+def not_modified(etag, max_age):
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
+
+
+def check_not_modified(request, resource):
+    """304 response if the client's ETag is still current, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    known = known_validator(resource)
+    if known is not None and etag_matches(if_none_match, known[0]):
+        return not_modified(*known)
+    return None
+
+
+def cache_stats():
+    return _validators.stats()
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.metrics import span
+from app.config import (
+    MODEL_STATE_PATH, MODEL_NPZ_PATH, MODEL_ARTIFACT_PATH, MODEL_BACKEND,
+    MODEL_INPUT_SIZE, MODEL_MAX_BATCH, MODEL_MAX_WAIT_MS, MODEL_FUSED,
+)
+
+
+def load_model(path=MODEL_STATE_PATH, fused=MODEL_FUSED, quantized=False):
+    """
+    Load NBeatsAQIModel weights once, in eval mode on CPU.
+    With fused=True the blocks are stacked into a FusedNBeatsAQIModel;
+    quantized=True returns the dynamic int8 variant instead.
+    """
+    import torch
+    from app.model_def import NBeatsAQIModel
+
+    model = NBeatsAQIModel()
+    state = torch.load(path, map_location="cpu", weights_only=False)
+    if isinstance(state, torch.nn.Module):
+        state = state.state_dict()
+    model.load_state_dict(state, strict=False)
+    model.eval()
+    if quantized:
+        return model.quantize()
+    return model.fuse() if fused else model
+
+
+class TorchBackend:
+    """Adapts a torch model to the NumPy-in/NumPy-out backend interface."""
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, x):
+        import torch
+
+        with torch.no_grad():
+            return self.model(torch.from_numpy(x)).numpy()
+
+
+def load_backend(backend=MODEL_BACKEND):
+    """
+    Return a callable mapping normalized [batch, 30] float32 arrays to
+    [batch] predictions. "numpy" never imports torch; "torch-int8" is the
+    dynamically quantized torch model.
+    """
+    if backend == "numpy":
+        from app.model_np import NumpyNBeatsModel
+        if os.path.exists(MODEL_ARTIFACT_PATH):
+            return NumpyNBeatsModel.load(MODEL_ARTIFACT_PATH)
+        return NumpyNBeatsModel.load(MODEL_NPZ_PATH)
+    if backend == "torch":
+        return TorchBackend(load_model())
+    if backend == "torch-int8":
+        return TorchBackend(load_model(quantized=True))
+    raise ValueError(f"Unknown MODEL_BACKEND: {backend}")
+
+
+def normalize_windows(windows):
+    """Per-window z-score, as used when the model was trained."""
+    mean = windows.mean(axis=1, keepdims=True)
+    std = windows.std(axis=1, keepdims=True) + 1e-8
+    return (windows - mean) / std, mean[:, 0], std[:, 0]
+
+
+class ModelRunner:
+    """
+    Micro-batching front end for the N-BEATS model.
+
+    predict() enqueues one 30-day window and awaits its result. A single
+    batching task collects queued windows until MODEL_MAX_BATCH is reached
+    or MODEL_MAX_WAIT_MS has passed since the first one arrived, then runs
+    the whole batch as one forward pass on a worker thread.
+
+    model is a backend callable from load_backend().
+    """
+    def __init__(self, model, max_batch_size=MODEL_MAX_BATCH, max_wait_ms=MODEL_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = None
+        self._task = None
+        # One thread: forward passes run back to back, never concurrently
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.total_queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.total_forward_seconds = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, window):
+        """Predict the next value for one window of MODEL_INPUT_SIZE readings."""
+        window = np.asarray(window, dtype=np.float32)
+        if window.shape != (MODEL_INPUT_SIZE,):
+            raise ValueError(f"expected {MODEL_INPUT_SIZE} values, got {window.shape}")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((window, future, time.perf_counter()))
+        return await future
+
+    def _forward(self, windows):
+        with span("model_inference"):
+            normalized, mean, std = normalize_windows(windows)
+            return self.model(normalized) * std + mean
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            windows = np.stack([window for window, _, _ in batch])
+            try:
+                preds = await loop.run_in_executor(self._executor, self._forward, windows)
+                error = None
+            except Exception as e:
+                preds, error = None, e
+            finished = time.perf_counter()
+
+            for i, (_, future, enqueued) in enumerate(batch):
+                waited = started - enqueued
+                self.total_queue_seconds += waited
+                self.max_queue_seconds = max(self.max_queue_seconds, waited)
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(float(preds[i]))
+
+            self.requests += len(batch)
+            self.batches += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_forward_seconds += finished - started
+
+    def stats(self):
+        model = getattr(self.model, "model", self.model)
+        return {
+            "backend": type(model).__name__,
+            "requests": self.requests,
+            "batches": self.batches,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_queue_ms": round(self.total_queue_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+            "max_queue_ms": round(self.max_queue_seconds * 1000, 3),
+            "avg_forward_ms": round(self.total_forward_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+        }
+
+
+_runner = None
+
+
+def start_model_runner(backend=None):
+    """
+    Start the batching task (called on startup). Pass a backend already
+    loaded off the event loop, otherwise it is loaded here.
+    """
+    global _runner
+    if _runner is None:
+        _runner = ModelRunner(backend if backend is not None else load_backend())
+    _runner.start()
+    return _runner
+
+
+async def stop_model_runner():
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
+
+
+def get_model_runner():
+    """The running ModelRunner, or None when the model is disabled/unavailable."""
+    return _runner
@@ -0,0 +1,39 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from app.config import LOG_LEVEL
+
+# Non-blocking logging.
+# Every "aqi.*" logger writes to a QueueHandler, which only enqueues the
+# record; a background QueueListener thread formats it and writes stdout.
+# Request handlers therefore never block on terminal/pipe I/O.
+
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL):
+    """Install the queue handler on the "aqi" logger (idempotent)."""
+    global _listener
+    root = logging.getLogger("aqi")
+    root.setLevel(level)
+    if _listener is not None:
+        return root
+
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"aqi.{name}")
@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus-style metrics (counters and histograms) rendered in
+# the text exposition format on /metrics. Kept dependency-free; label
+# values must come from a small fixed set (stage names, route templates).
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = _format_labels(self.labelnames, labels, ("le", repr(bound)))
+                lines.append(f"{self.name}_bucket{le} {count}")
+            inf = _format_labels(self.labelnames, labels, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+def register_collector(fn):
+    """
+    Register a callable returning [(name, type, help, [(labels dict, value)])]
+    evaluated at scrape time (e.g. cache counters kept elsewhere).
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """All metrics in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    # Several collectors may report the same family (e.g. one cache_collector
+    # per module); the text format needs one contiguous block per family.
+    families = {}
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            family = families.setdefault(name, (kind, help, []))
+            family[2].extend(samples)
+    for name, (kind, help, samples) in families.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- APPLICATION METRICS ----------------
+HTTP_REQUESTS = Counter(
+    "aqi_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "aqi_http_request_duration_seconds", "End-to-end request latency", ("route",)
+)
+STAGE_LATENCY = Histogram(
+    "aqi_stage_duration_seconds",
+    "Latency of internal stages (upstream_current, upstream_forecast, upstream_waqi, "
+    "db_query, db_write, model_inference, serialization)",
+    ("stage",),
+)
+UPSTREAM_ERRORS = Counter(
+    "aqi_upstream_errors_total", "Failed upstream calls by upstream and reason", ("upstream", "reason")
+)
+
+
+def span(stage):
+    """Time a stage: `with span("upstream_current"): ...`"""
+    return STAGE_LATENCY.time(stage)
+
+
+def cache_collector(*caches):
+    """Collector exposing TTLCache hit/miss counters."""
+    def collect():
+        stats = [cache.stats() for cache in caches]
+        return [
+            (f"aqi_cache_{field}_total", "counter", f"Cache {field} by cache",
+             [({"cache": s["name"]}, s[field]) for s in stats])
+            for field in ("hits", "misses", "coalesced", "evictions")
+        ] + [
+            ("aqi_cache_entries", "gauge", "Entries currently cached",
+             [({"cache": s["name"]}, s["size"]) for s in stats]),
+        ]
+    return collect
@@ -1,5 +1,8 @@
 import torch
 import torch.nn as nn
+from app.log import get_logger
+
+logger = get_logger("model")
 
 class NBeatsBlock(nn.Module):
     """
@@ -68,6 +71,23 @@ class NBeatsAQIModel(nn.Module):
         # Return as 1D tensor for batch
         return forecast.squeeze(1)
     
+    def fuse(self):
+        """
+        Build an inference-only FusedNBeatsAQIModel from the loaded weights.
+        """
+        return FusedNBeatsAQIModel(self).eval()
+    
+    def quantize(self):
+        """
+        Return a CPU inference copy with dynamic int8 weights for every
+        nn.Linear (fc1-fc4 and theta in all blocks). Activations stay float
+        and are quantized on the fly per batch.
+        """
+        import copy
+        from torch.ao.quantization import quantize_dynamic
+        
+        return quantize_dynamic(copy.deepcopy(self).eval(), {nn.Linear}, dtype=torch.qint8)
+    
     def load_state_dict(self, state_dict, strict=True):
         """
         Custom loader to map parameters.X format to the model structure.
@@ -82,7 +102,7 @@ class NBeatsAQIModel(nn.Module):
         Total: 54 parameters = 6 blocks × 9 parameters
         """
         if any(key.startswith('parameters.') for key in state_dict.keys()):
-            print("📦 Loading N-BEATS model with 'parameters.X' format")
+            logger.info("📦 Loading N-BEATS model with 'parameters.X' format")
             
             new_state_dict = {}
             param_idx = 0
@@ -116,8 +136,53 @@ class NBeatsAQIModel(nn.Module):
             
             # Load the remapped state dict
             result = super().load_state_dict(new_state_dict, strict=strict)
-            print(f"✅ Successfully loaded {param_idx} parameters into 6 N-BEATS blocks")
+            logger.info("✅ Successfully loaded %s parameters into 6 N-BEATS blocks", param_idx)
             return result
         else:
             # Standard loading
-            return super().load_state_dict(state_dict, strict=strict)
\ No newline at end of file
+            return super().load_state_dict(state_dict, strict=strict)
+
+
+class FusedNBeatsAQIModel(nn.Module):
+    """
+    Inference-only N-BEATS that evaluates all 6 blocks at once.
+
+    All blocks read the same 30-wide input and use 128-wide hidden layers:
+    - fc1 of every block is concatenated into one [30, 6*128] matmul
+    - fc2-fc4 are stacked into [6, 128, 128] tensors and run as one bmm each
+    - each block contributes theta(x).mean(), which equals x @ mean(theta
+      rows), so the theta layers collapse into a single [6, 128] tensor
+
+    Output matches NBeatsAQIModel up to float rounding.
+    """
+    def __init__(self, model):
+        super().__init__()
+        blocks = model.blocks
+        self.num_blocks = len(blocks)
+        self.hidden_size = model.hidden_size
+
+        with torch.no_grad():
+            self.register_buffer("w1", torch.cat([b.fc1.weight.t() for b in blocks], dim=1).contiguous())
+            self.register_buffer("b1", torch.cat([b.fc1.bias for b in blocks]).contiguous())
+
+            for i in range(2, 5):
+                fc = [getattr(block, f"fc{i}") for block in blocks]
+                # [blocks, in, out] so that h @ w works with h: [blocks, batch, in]
+                self.register_buffer(f"w{i}", torch.stack([f.weight.t() for f in fc]).contiguous())
+                self.register_buffer(f"b{i}", torch.stack([f.bias for f in fc]).unsqueeze(1).contiguous())
+
+            self.register_buffer(
+                "theta", torch.stack([b.theta.weight.mean(dim=0) for b in blocks]).unsqueeze(2).contiguous()
+            )
+
+    def forward(self, x):
+        # [batch, blocks*hidden] -> [blocks, batch, hidden]
+        h = torch.addmm(self.b1, x, self.w1).relu_()
+        h = h.view(-1, self.num_blocks, self.hidden_size).transpose(0, 1).contiguous()
+
+        h = torch.bmm(h, self.w2).add_(self.b2).relu_()
+        h = torch.bmm(h, self.w3).add_(self.b3).relu_()
+        h = torch.bmm(h, self.w4).add_(self.b4).relu_()
+
+        # Sum of per-block contributions: [blocks, batch, 1] -> [batch]
+        return torch.bmm(h, self.theta).sum(dim=0).squeeze(1)
@@ -0,0 +1,79 @@
+import numpy as np
+
+# Torch-free N-BEATS inference.
+# Evaluates the same stacked computation as FusedNBeatsAQIModel with NumPy
+# only. Weights come from a model artifact (app/artifact.py, already in
+# fused layout and memory-mapped) or from the .npz written by export_numpy.py.
+
+NUM_BLOCKS = 6
+
+FUSED_NAMES = ("w1", "b1", "w2", "b2", "w3", "b3", "w4", "b4", "theta")
+
+
+def fuse_state_dict(weights):
+    """
+    Stack a remapped state dict ("blocks.{i}.fc1.weight", ...) into the
+    fused layout used by NumpyNBeatsModel.
+    """
+    blocks = range(NUM_BLOCKS)
+
+    def w(i, name):
+        return np.asarray(weights[f"blocks.{i}.{name}"], dtype=np.float32)
+
+    fused = {
+        "w1": np.concatenate([w(i, "fc1.weight").T for i in blocks], axis=1),
+        "b1": np.concatenate([w(i, "fc1.bias") for i in blocks]),
+    }
+    for n in range(2, 5):
+        fused[f"w{n}"] = np.stack([w(i, f"fc{n}.weight").T for i in blocks])
+        fused[f"b{n}"] = np.stack([w(i, f"fc{n}.bias") for i in blocks])[:, None, :]
+
+    # Each block contributes theta(x).mean() == x @ mean(theta rows)
+    fused["theta"] = np.stack([w(i, "theta.weight").mean(axis=0) for i in blocks])[:, :, None]
+
+    return {name: np.ascontiguousarray(a) for name, a in fused.items()}
+
+
+class NumpyNBeatsModel:
+    """
+    Pure-NumPy forward pass for NBeatsAQIModel.
+
+    Takes fused tensors (see fuse_state_dict) and uses them as-is, so
+    arrays memory-mapped from an artifact are never copied. Input is a
+    float32 [batch, 30] array of normalized windows, output is [batch].
+    """
+    def __init__(self, fused):
+        self.w1 = fused["w1"]
+        self.b1 = fused["b1"]
+        self.layers = [(fused[f"w{n}"], fused[f"b{n}"]) for n in range(2, 5)]
+        self.theta = fused["theta"]
+
+        self.input_size = self.w1.shape[0]
+        self.hidden_size = self.w1.shape[1] // NUM_BLOCKS
+
+    @classmethod
+    def load(cls, path):
+        """Load from a model artifact or a state-dict .npz."""
+        if path.endswith(".npz"):
+            with np.load(path) as weights:
+                return cls(fuse_state_dict({key: weights[key] for key in weights.files}))
+
+        from app.artifact import load_artifact
+        _, tensors = load_artifact(path)
+        return cls(tensors)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+
+        h = x @ self.w1
+        h += self.b1
+        np.maximum(h, 0, out=h)
+        # [batch, blocks*hidden] -> [blocks, batch, hidden]
+        h = np.ascontiguousarray(h.reshape(-1, NUM_BLOCKS, self.hidden_size).transpose(1, 0, 2))
+
+        for weight, bias in self.layers:
+            h = np.matmul(h, weight)
+            h += bias
+            np.maximum(h, 0, out=h)
+
+        return np.matmul(h, self.theta).sum(axis=0)[:, 0]
@@ -1,16 +1,35 @@
+import asyncio
+import math
 import os
-import requests
-from dotenv import load_dotenv
+import numpy as np
+from datetime import date
+from app import upstream
+from app.cache import TTLCache
+from app.guard import UpstreamGuard, UpstreamClientError, UpstreamUnavailable, guard_collector
+from app.shared_cache import get_shared_cache
+from app.geo import StationIndex
+from app.history import get_history_store
+from app.inference import get_model_runner
+from app.log import get_logger
+from app.metrics import UPSTREAM_ERRORS, cache_collector, register_collector, span
+from app.config import (
+    OPENWEATHER_CACHE_TTL, OPENWEATHER_CACHE_SIZE,
+    GPS_CELL_SIZE_DEG, GPS_CACHE_TTL, GPS_CACHE_SIZE,
+    MODEL_INPUT_SIZE, MODEL_HISTORY_SOURCE, FORECAST_UTC_OFFSET_MINUTES,
+    OPENWEATHER_BASE_URL, DATABASE_URL,
+    OPENWEATHER_WORKER_RATE, OPENWEATHER_WORKER_BURST, OPENWEATHER_RATE_WAIT,
+    BREAKER_FAILURES, BREAKER_RESET_SECONDS, STALE_AFTER_SECONDS, STALE_TTL,
+)
 
-load_dotenv()
+logger = get_logger("predictor")
 
 # ✅ Correct env variable
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 if not OPENWEATHER_API_KEY:
-    print("❌ ERROR: OPENWEATHER_API_KEY not found in .env file!")
+    logger.error("❌ ERROR: OPENWEATHER_API_KEY not found in .env file!")
 else:
-    print(f"🔑 Using API Key: {OPENWEATHER_API_KEY[:10]}...")
+    logger.info("🔑 Using API Key: %s...", OPENWEATHER_API_KEY[:10])
 
 # City coordinates
 CITY_COORDS = {
@@ -31,6 +50,56 @@ CITY_COORDS = {
     "Ooty": (11.4102, 76.6950),
 }
 
+CITY_INDEX = StationIndex(CITY_COORDS)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+OPENWEATHER_URLS = {
+    "current": f"{OPENWEATHER_BASE_URL}/air_pollution",
+    "forecast": f"{OPENWEATHER_BASE_URL}/air_pollution/forecast",
+}
+
+def _store_revalidated(key, payload):
+    """A slow fetch served stale finished: cache its fresh payload."""
+    _openweather_cache.set(key, payload)
+
+
+# Quota, circuit breaker and last-known-good payloads for OpenWeather
+openweather_guard = UpstreamGuard(
+    "openweather", OPENWEATHER_WORKER_RATE, OPENWEATHER_WORKER_BURST,
+    max_wait=OPENWEATHER_RATE_WAIT,
+    failure_threshold=BREAKER_FAILURES,
+    reset_timeout=BREAKER_RESET_SECONDS,
+    stale_after=STALE_AFTER_SECONDS,
+    stale_ttl=STALE_TTL,
+    stale_size=OPENWEATHER_CACHE_SIZE,
+    on_revalidate=_store_revalidated,
+)
+
+# Cache of raw OpenWeather payloads keyed by (endpoint, lat, lon).
+# Stale fallbacks (marked "stale": True) are returned but never cached.
+# With several workers the shared store sits behind it as an L2.
+_openweather_cache = TTLCache(
+    maxsize=OPENWEATHER_CACHE_SIZE,
+    ttl=OPENWEATHER_CACHE_TTL,
+    name="openweather",
+    cacheable=lambda payload: payload is not None and not payload.get("stale"),
+    l2=get_shared_cache(),
+)
+
+# Cache of GPS predictions (current, predicted, stale, observed_at) keyed by
+# snapped grid cell
+_gps_cache = TTLCache(
+    maxsize=GPS_CACHE_SIZE,
+    ttl=GPS_CACHE_TTL,
+    name="gps",
+    cacheable=lambda result: result is not None and not result[2],
+    l2=get_shared_cache(),
+)
+
+register_collector(cache_collector(_openweather_cache, _gps_cache))
+register_collector(guard_collector(openweather_guard))
+
 def calculate_aqi_from_pm25(pm25):
     if pm25 <= 12.0:
         return int((50 / 12.0) * pm25)
@@ -46,102 +115,320 @@ def calculate_aqi_from_pm25(pm25):
         return int(300 + ((500 - 300) / (500.4 - 250.5)) * (pm25 - 250.5))
 
 
-def predict_city(city_name):
+# PM2.5 breakpoint table, segment by segment identical to
+# calculate_aqi_from_pm25: a value falls in the first segment whose upper
+# bound it does not exceed, then AQI = aqi_low + slope * (pm25 - pm25_low)
+PM25_UPPER = np.array([12.0, 35.4, 55.4, 150.4, 250.4, np.inf])
+PM25_LOW = np.array([0.0, 12.1, 35.5, 55.5, 150.5, 250.5])
+AQI_LOW = np.array([0.0, 50.0, 100.0, 150.0, 200.0, 300.0])
+AQI_SLOPE = np.array([
+    50 / 12.0,
+    (100 - 50) / (35.4 - 12.1),
+    (150 - 100) / (55.4 - 35.5),
+    (200 - 150) / (150.4 - 55.5),
+    (300 - 200) / (250.4 - 150.5),
+    (500 - 300) / (500.4 - 250.5),
+])
+
+
+def calculate_aqi_from_pm25_array(pm25):
+    """Vectorized calculate_aqi_from_pm25 for an array of PM2.5 values."""
+    pm25 = np.asarray(pm25, dtype=np.float64)
+    segment = np.searchsorted(PM25_UPPER, pm25, side="left")
+    aqi = AQI_LOW[segment] + AQI_SLOPE[segment] * (pm25 - PM25_LOW[segment])
+    # int() truncates toward zero
+    return np.trunc(aqi).astype(np.int64)
+
+
+def _openweather_params(lat, lon):
+    return {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY}
+
+
+def _openweather_payload(endpoint, res):
+    # 4xx (except 429 quota) means this request was bad, not that
+    # OpenWeather is down: keep it away from the breaker and the cache
+    if 400 <= res.status_code < 500 and res.status_code != 429:
+        UPSTREAM_ERRORS.inc("openweather", str(res.status_code))
+        raise UpstreamClientError("openweather", res.status_code, res.text[:200])
+    if res.status_code != 200:
+        UPSTREAM_ERRORS.inc("openweather", str(res.status_code))
+        logger.warning("OpenWeather %s returned %s: %s", endpoint, res.status_code, res.text[:200])
+        return None
+
+    return res.json()
+
+
+async def _request_openweather_async(endpoint, lat, lon):
+    try:
+        with span(f"upstream_{endpoint}"):
+            res = await upstream.get_async(OPENWEATHER_URLS[endpoint], params=_openweather_params(lat, lon))
+    except Exception as e:
+        UPSTREAM_ERRORS.inc("openweather", type(e).__name__)
+        raise
+
+    return _openweather_payload(endpoint, res)
+
+
+def _mark_stale(result):
+    payload, stale = result
+    return {**payload, "stale": True} if stale else payload
+
+
+async def _guarded_openweather_async(endpoint, lat, lon):
+    try:
+        return _mark_stale(await openweather_guard.call_async(
+            (endpoint, lat, lon), lambda: _request_openweather_async(endpoint, lat, lon),
+        ))
+    except (UpstreamUnavailable, UpstreamClientError) as e:
+        logger.warning("⚠️ %s (%s %s,%s)", e, endpoint, lat, lon)
+        return None
+
+
+async def fetch_openweather_async(endpoint, lat, lon):
+    """
+    Fetch an OpenWeather air-pollution payload ("current" or "forecast").
+
+    Results are cached per (endpoint, lat, lon); concurrent misses for the
+    same location share a single upstream request. Calls go through
+    openweather_guard: when OpenWeather is failing, slow or over quota the
+    last known good payload is returned with "stale": True. Returns None if
+    there is none.
+    """
+    return await _openweather_cache.get_or_load_async(
+        (endpoint, lat, lon),
+        lambda: _guarded_openweather_async(endpoint, lat, lon),
+    )
+
+
+def _is_stale(*payloads):
+    return any(p is not None and p.get("stale", False) for p in payloads)
+
+
+def _observed_at(data):
+    """Unix time of the current observation ("dt"), or None if missing."""
+    dt = data["list"][0].get("dt")
+    return int(dt) if dt is not None else None
+
+
+async def fetch_current_and_forecast(lat, lon):
+    """
+    Fetch the current and forecast payloads concurrently.
+
+    A failed forecast fetch is reported as None so callers can fall back;
+    a failed current fetch is raised.
+    """
+    data, forecast_data = await asyncio.gather(
+        fetch_openweather_async("current", lat, lon),
+        fetch_openweather_async("forecast", lat, lon),
+        return_exceptions=True,
+    )
+    if isinstance(data, BaseException):
+        raise data
+    if isinstance(forecast_data, BaseException):
+        logger.warning("Forecast error: %s", forecast_data)
+        forecast_data = None
+    return data, forecast_data
+
+
+def snap_to_grid(lat, lon, cell_size=GPS_CELL_SIZE_DEG):
+    """Return the center of the grid cell containing (lat, lon)."""
+    if cell_size <= 0:
+        return lat, lon
+    return (
+        round((math.floor(lat / cell_size) + 0.5) * cell_size, 6),
+        round((math.floor(lon / cell_size) + 0.5) * cell_size, 6),
+    )
+
+
+def cache_stats():
+    return {
+        "openweather": _openweather_cache.stats(),
+        "gps": {**_gps_cache.stats(), "cell_size_deg": GPS_CELL_SIZE_DEG},
+        "openweather_guard": openweather_guard.stats(),
+    }
+
+
+def _aqi_from_payloads(data, forecast_data):
+    """
+    Return (current_aqi, predicted_aqi) from OpenWeather payloads.
+    predicted_aqi is None when the forecast is unavailable.
+    """
+    pm25 = data["list"][0]["components"]["pm2_5"]
+    current_aqi = calculate_aqi_from_pm25(pm25)
+
+    predicted_aqi = None
+    if forecast_data is not None and len(forecast_data["list"]) >= 24:
+        tomorrow_pm25 = forecast_data["list"][24]["components"]["pm2_5"]
+        predicted_aqi = calculate_aqi_from_pm25(tomorrow_pm25)
+
+    return current_aqi, predicted_aqi
+
+
+def _history_window(city):
+    """Last MODEL_INPUT_SIZE daily readings for a city, or None if unavailable."""
+    if MODEL_HISTORY_SOURCE == "csv":
+        # None when the window is mostly gap-filled or out of date
+        return get_history_store().model_window(city, MODEL_INPUT_SIZE)
+
+    if not DATABASE_URL:
+        return None
+
+    # Imported lazily: sqlalchemy is only needed for MODEL_HISTORY_SOURCE=db
+    from app.db_manager import get_city_history
+    values = get_city_history(city, MODEL_INPUT_SIZE)
+    if len(values) < MODEL_INPUT_SIZE:
+        return None
+    return values
+
+
+async def _fallback_prediction(city, current_aqi):
+    """
+    Next-day AQI when the forecast is unavailable: the N-BEATS model over
+    the city's recent history if possible, otherwise current_aqi + 5.
+    """
+    runner = get_model_runner()
+    if runner is not None:
+        try:
+            window = await asyncio.to_thread(_history_window, city)
+            if window is not None:
+                return int(await runner.predict(window))
+        except Exception as e:
+            logger.warning("⚠️ Model fallback failed for %s: %s", city, e)
+
+    return current_aqi + 5
+
+
+async def predict_city_async(city_name):
+    """
+    Return (history, predicted_aqi, stale, observed_at) for a city, or
+    (None, None, False, None). stale is True when a last known good
+    OpenWeather payload was used; observed_at is its observation time.
+    """
+    try:
+        if city_name not in CITY_COORDS:
+            return None, None, False, None
+
+        lat, lon = CITY_COORDS[city_name]
+
+        data, forecast_data = await fetch_current_and_forecast(lat, lon)
+        if data is None:
+            return None, None, False, None
+
+        current_aqi, predicted_aqi = _aqi_from_payloads(data, forecast_data)
+        if predicted_aqi is None:
+            predicted_aqi = await _fallback_prediction(city_name, current_aqi)
+        return [current_aqi], predicted_aqi, _is_stale(data, forecast_data), _observed_at(data)
+
+    except Exception as e:
+        logger.error("Error: %s", e)
+        return None, None, False, None
+
+
+def forecast_curve(forecast_data):
+    """
+    Hourly AQI curve and per-day min/mean/max from one forecast payload.
+    Days are local dates (UTC + FORECAST_UTC_OFFSET_MINUTES).
+    """
+    items = forecast_data["list"]
+    if not items:
+        return [], []
+
+    dt = np.array([item["dt"] for item in items], dtype=np.int64)
+    pm25 = np.array([item["components"]["pm2_5"] for item in items], dtype=np.float64)
+
+    order = np.argsort(dt, kind="stable")
+    dt, pm25 = dt[order], pm25[order]
+    aqi = calculate_aqi_from_pm25_array(pm25)
+
+    # Sorted by time, so each day is one contiguous run
+    local_day = (dt + FORECAST_UTC_OFFSET_MINUTES * 60) // 86400
+    starts = np.flatnonzero(np.r_[True, local_day[1:] != local_day[:-1]])
+    counts = np.diff(np.r_[starts, len(aqi)])
+
+    mins = np.minimum.reduceat(aqi, starts)
+    maxs = np.maximum.reduceat(aqi, starts)
+    means = np.add.reduceat(aqi, starts) / counts
+
+    hourly = [{"dt": int(t), "aqi": int(a)} for t, a in zip(dt, aqi)]
+    daily = [
+        {
+            "date": date.fromordinal(int(day) + EPOCH_ORDINAL).isoformat(),
+            "min_aqi": int(lo),
+            "mean_aqi": round(float(mean), 1),
+            "max_aqi": int(hi),
+            "hours": int(n),
+        }
+        for day, lo, mean, hi, n in zip(local_day[starts], mins, means, maxs, counts)
+    ]
+    return hourly, daily
+
+
+async def forecast_city_async(city_name):
+    """Return (hourly, daily, stale) forecast AQI for a city, or (None, None, False)."""
     try:
         if city_name not in CITY_COORDS:
-            return None, None
+            return None, None, False
 
         lat, lon = CITY_COORDS[city_name]
+        forecast_data = await fetch_openweather_async("forecast", lat, lon)
+        if forecast_data is None:
+            return None, None, False
 
-        # Current AQI
-        current_url = (
-            f"http://api.openweathermap.org/data/2.5/air_pollution?"
-            f"lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-        )
-
-        current_res = requests.get(current_url, timeout=10)
-        if current_res.status_code != 200:
-            print(current_res.text)
-            return None, None
-
-        data = current_res.json()
-        pm25 = data["list"][0]["components"]["pm2_5"]
-        current_aqi = calculate_aqi_from_pm25(pm25)
-
-        # Forecast AQI
-        forecast_url = (
-            f"http://api.openweathermap.org/data/2.5/air_pollution/forecast?"
-            f"lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-        )
-
-        forecast_res = requests.get(forecast_url, timeout=10)
-
-        if forecast_res.status_code == 200:
-            forecast_data = forecast_res.json()
-            if len(forecast_data["list"]) >= 24:
-                tomorrow_pm25 = forecast_data["list"][24]["components"]["pm2_5"]
-                predicted_aqi = calculate_aqi_from_pm25(tomorrow_pm25)
-            else:
-                predicted_aqi = current_aqi + 5
-        else:
-            predicted_aqi = current_aqi + 5
-
-        return [current_aqi], predicted_aqi
+        hourly, daily = forecast_curve(forecast_data)
+        return hourly, daily, _is_stale(forecast_data)
 
     except Exception as e:
-        print("Error:", e)
-        return None, None
+        logger.error("Error: %s", e)
+        return None, None, False
+
+
+async def predict_cities_async(city_names=None):
+    """
+    Predict several cities concurrently (all of CITY_COORDS by default).
+
+    Returns {city: (history, predicted_aqi, stale, observed_at)}; unknown or
+    failed cities map to (None, None, False, None) like predict_city_async().
+    """
+    if city_names is None:
+        city_names = list(CITY_COORDS)
+
+    results = await asyncio.gather(*(predict_city_async(c) for c in city_names))
+    return dict(zip(city_names, results))
 
 
-def predict_latlon(lat, lon):
+async def _predict_cell_async(cell_lat, cell_lon):
+    data, forecast_data = await fetch_current_and_forecast(cell_lat, cell_lon)
+    if data is None:
+        return None
+
+    current_aqi, predicted_aqi = _aqi_from_payloads(data, forecast_data)
+    if predicted_aqi is None:
+        city = find_nearest_city(cell_lat, cell_lon)
+        predicted_aqi = await _fallback_prediction(city, current_aqi)
+    return current_aqi, predicted_aqi, _is_stale(data, forecast_data), _observed_at(data)
+
+
+async def predict_latlon_async(lat, lon):
+    """
+    Return (city, history, predicted_aqi, stale, observed_at), or
+    (None, None, None, False, None).
+    """
     try:
-        current_url = (
-            f"http://api.openweathermap.org/data/2.5/air_pollution?"
-            f"lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-        )
-
-        res = requests.get(current_url, timeout=10)
-        if res.status_code != 200:
-            return None, None, None
-
-        data = res.json()
-        pm25 = data["list"][0]["components"]["pm2_5"]
-        current_aqi = calculate_aqi_from_pm25(pm25)
-
-        forecast_url = (
-            f"http://api.openweathermap.org/data/2.5/air_pollution/forecast?"
-            f"lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-        )
-
-        forecast_res = requests.get(forecast_url, timeout=10)
-
-        if forecast_res.status_code == 200:
-            forecast_data = forecast_res.json()
-            if len(forecast_data["list"]) >= 24:
-                tomorrow_pm25 = forecast_data["list"][24]["components"]["pm2_5"]
-                predicted_aqi = calculate_aqi_from_pm25(tomorrow_pm25)
-            else:
-                predicted_aqi = current_aqi + 5
-        else:
-            predicted_aqi = current_aqi + 5
+        cell = snap_to_grid(lat, lon)
+        result = await _gps_cache.get_or_load_async(cell, lambda: _predict_cell_async(*cell))
+        if result is None:
+            return None, None, None, False, None
 
+        current_aqi, predicted_aqi, stale, observed_at = result
         city = find_nearest_city(lat, lon)
-        return city, [current_aqi], predicted_aqi
+        return city, [current_aqi], predicted_aqi, stale, observed_at
 
     except Exception as e:
-        print("Error:", e)
-        return None, None, None
+        logger.error("Error: %s", e)
+        return None, None, None, False, None
 
 
 def find_nearest_city(lat, lon):
-    import math
-    min_dist = float("inf")
-    nearest = "Coimbatore"
-
-    for city, (clat, clon) in CITY_COORDS.items():
-        dist = math.sqrt((lat - clat)**2 + (lon - clon)**2)
-        if dist < min_dist:
-            min_dist = dist
-            nearest = city
-
-    return nearest
\ No newline at end of file
+    """Closest city by great-circle distance."""
+    nearest, _ = CITY_INDEX.nearest(lat, lon)
+    return nearest or "Coimbatore"
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    acquire() blocks until a token is available, acquire_async() awaits one.
+    """
+    def __init__(self, rate, capacity=1, name="limiter"):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.granted = 0
+        self.rejected = 0
+
+    def _reserve(self, tokens):
+        """Take tokens if available; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.granted += 1
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are granted; False if timeout expires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """Async variant of acquire() that yields to the event loop while waiting."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "granted": self.granted,
+            "rejected": self.rejected,
+        }
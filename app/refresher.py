@@ -0,0 +1,218 @@
+import asyncio
+import random
+import time
+from datetime import date
+from app.config import (
+    REFRESH_INTERVAL, REFRESH_JITTER, SNAPSHOT_MAX_AGE, REFRESH_DB_ENABLED,
+    REFRESH_LOCK_PATH, SNAPSHOT_SYNC_INTERVAL, MODEL_HISTORY_SOURCE,
+)
+from app.health import health_recommendation
+from app.history import get_history_store
+from app.log import get_logger
+from app.predictor import predict_cities_async
+from app.shared_cache import LeaderLock, get_shared_cache
+from app.stream import hub
+
+logger = get_logger("refresher")
+
+# Precomputed city predictions.
+# The refresher builds a new dict and swaps the module-level reference, so
+# readers always see a complete snapshot without taking a lock.
+_snapshot = {}   # city -> (updated_at, response dict)
+_task = None
+
+# With several workers only the holder of this lock refreshes; the others
+# copy its snapshot from the shared store every SNAPSHOT_SYNC_INTERVAL
+# (created by start_refresher so importing this module opens nothing)
+_leader = None
+SNAPSHOT_KEY_PREFIX = "snapshot:"
+
+
+def lookup_city(city):
+    """
+    Return (response, age_seconds) for a city from the current snapshot.
+    response is None when the city is missing or older than SNAPSHOT_MAX_AGE.
+    """
+    entry = _snapshot.get(city)
+    if entry is None:
+        return None, None
+
+    updated_at, response = entry
+    age = time.monotonic() - updated_at
+    if age > SNAPSHOT_MAX_AGE:
+        return None, age
+    return response, age
+
+
+def snapshot_status():
+    now = time.monotonic()
+    ages = [now - updated_at for updated_at, _ in _snapshot.values()]
+    return {
+        "cities": len(_snapshot),
+        "oldest_age_seconds": round(max(ages), 1) if ages else None,
+        "newest_age_seconds": round(min(ages), 1) if ages else None,
+        "role": "single" if _leader is None else ("leader" if _leader.held else "follower"),
+        "interval_seconds": REFRESH_INTERVAL,
+        "max_age_seconds": SNAPSHOT_MAX_AGE,
+    }
+
+
+def _record_readings(snapshot, cities):
+    """
+    Blocking side of a refresh, run off the event loop: feed the new
+    readings to the CSV-backed model history (loading it on first use)
+    and, with REFRESH_DB_ENABLED, to the database.
+    """
+    if MODEL_HISTORY_SOURCE == "csv":
+        store = get_history_store()
+        today = date.today()
+        for city in cities:
+            # Latest reading of the day wins in the model's history windows
+            store.append(city, today, float(snapshot[city][1]["current_aqi"]))
+
+    if REFRESH_DB_ENABLED:
+        # Imported lazily: keeps sqlalchemy off the startup path
+        from app.db_manager import update_all_cities_db
+        from app.timeseries import ingest_hourly
+        update_all_cities_db()
+        ingest_hourly([
+            {
+                "city": city,
+                "ts": snapshot[city][1]["observed_at"] or time.time(),
+                "aqi": snapshot[city][1]["current_aqi"],
+                "source": "openweather",
+            }
+            for city in cities
+        ])
+
+
+async def refresh_once():
+    """Recompute every city and atomically swap in the new snapshot."""
+    global _snapshot
+
+    predictions = await predict_cities_async()
+    now = time.monotonic()
+
+    # Keep the previous entry for cities that failed this round
+    snapshot = dict(_snapshot)
+    refreshed = []
+    for city, (history, next_day, stale, observed_at) in predictions.items():
+        # A stale result is older than what the snapshot already holds
+        if not history or next_day is None or stale:
+            continue
+        snapshot[city] = (now, {
+            "city": city,
+            "current_aqi": int(history[-1]),
+            "predicted_next_day": int(next_day),
+            "health": health_recommendation(next_day),
+            "stale": False,
+            "observed_at": observed_at,
+        })
+        refreshed.append(city)
+
+    _snapshot = snapshot
+    logger.info("🔄 Snapshot refreshed: %s/%s cities", len(refreshed), len(predictions))
+    _broadcast(snapshot, refreshed)
+
+    if _leader is not None:
+        await asyncio.to_thread(_publish_snapshot, snapshot)
+
+    # The snapshot is already live; a storage failure doesn't undo the refresh
+    try:
+        await asyncio.to_thread(_record_readings, snapshot, refreshed)
+    except Exception as e:
+        logger.error("❌ Recording readings failed: %s", e)
+
+    return len(refreshed)
+
+
+def _broadcast(snapshot, cities):
+    """Push entries to stream subscribers; the hub drops unchanged ones."""
+    for city in cities:
+        hub.publish(city, snapshot[city][1])
+
+
+def _publish_snapshot(snapshot):
+    """Leader: write the snapshot to the shared store (wall-clock timestamps)."""
+    shared = get_shared_cache()
+    offset = time.time() - time.monotonic()
+    for city, (updated_at, response) in snapshot.items():
+        shared.set(
+            SNAPSHOT_KEY_PREFIX + city,
+            {"updated_at": updated_at + offset, "response": response},
+            ttl=SNAPSHOT_MAX_AGE,
+        )
+    shared.purge_expired()
+
+
+def sync_snapshot():
+    """
+    Follower: adopt entries the leader published that are newer than ours.
+    Returns the cities that were updated.
+    """
+    global _snapshot
+
+    offset = time.time() - time.monotonic()
+    snapshot = dict(_snapshot)
+    store = get_history_store() if MODEL_HISTORY_SOURCE == "csv" else None
+    synced = []
+    for key, entry in get_shared_cache().items(SNAPSHOT_KEY_PREFIX):
+        city = key[len(SNAPSHOT_KEY_PREFIX):]
+        updated_at = entry["updated_at"] - offset
+        current = snapshot.get(city)
+        if current is not None and current[0] >= updated_at - 0.001:
+            continue
+        response = entry["response"]
+        if store is not None:
+            store.append(city, date.fromtimestamp(entry["updated_at"]), float(response["current_aqi"]))
+        snapshot[city] = (updated_at, response)
+        synced.append(city)
+
+    _snapshot = snapshot
+    if synced:
+        logger.debug("🔄 Synced %s snapshot entries from the leader", len(synced))
+    return synced
+
+
+async def _refresh_loop():
+    while True:
+        if _leader is None or _leader.try_acquire():
+            try:
+                await refresh_once()
+            except Exception as e:
+                logger.error("❌ Snapshot refresh failed: %s", e)
+            delay = REFRESH_INTERVAL + random.uniform(-REFRESH_JITTER, REFRESH_JITTER)
+        else:
+            # Retrying the lock each round lets a follower take over if the
+            # leader's process dies
+            try:
+                synced = await asyncio.to_thread(sync_snapshot)
+                # Each worker has its own hub, so followers publish too
+                _broadcast(_snapshot, synced)
+            except Exception as e:
+                logger.error("❌ Snapshot sync failed: %s", e)
+            delay = SNAPSHOT_SYNC_INTERVAL
+
+        await asyncio.sleep(max(delay, 1.0))
+
+
+def start_refresher():
+    global _task, _leader
+    if _leader is None and get_shared_cache() is not None:
+        _leader = LeaderLock(REFRESH_LOCK_PATH)
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_refresh_loop())
+    return _task
+
+
+async def stop_refresher():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _leader is not None:
+        _leader.release()
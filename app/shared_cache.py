@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import SHARED_CACHE_ENABLED, SHARED_CACHE_PATH
+from app.log import get_logger
+
+logger = get_logger("shared_cache")
+
+
+class SharedCache:
+    """
+    Cross-process key/value store on a SQLite database in WAL mode.
+
+    Every worker opens the same file, so a value fetched by one worker is
+    visible to all of them. Values are JSON (tuples come back as lists),
+    keys are repr()'d, expiry uses wall-clock time since monotonic clocks
+    are per process. WAL lets readers proceed while one writer commits;
+    synchronous=NORMAL skips the per-commit fsync, which is fine for a cache.
+    """
+    def __init__(self, path, name="shared"):
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _conn(self):
+        """
+        One connection per thread (sqlite3 connections aren't thread-safe),
+        opened on first use so creating a SharedCache touches no files.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, str) else repr(key)
+
+    def get_with_ttl(self, key):
+        """(value, seconds left) or (None, None) when missing or expired."""
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (self._key(key),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("⚠️ Shared cache read failed: %s", e)
+            return None, None
+
+        remaining = row[1] - time.time() if row is not None else 0
+        if remaining <= 0:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        return json.loads(row[0]), remaining
+
+    def get(self, key):
+        return self.get_with_ttl(key)[0]
+
+    def set(self, key, value, ttl):
+        try:
+            self._conn().execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (self._key(key), json.dumps(value), time.time() + ttl),
+            )
+            self.writes += 1
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.errors += 1
+            logger.warning("⚠️ Shared cache write failed: %s", e)
+
+    def delete(self, key):
+        try:
+            self._conn().execute("DELETE FROM kv WHERE key = ?", (self._key(key),))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("⚠️ Shared cache delete failed: %s", e)
+
+    def items(self, prefix):
+        """Unexpired (key, value) pairs whose key starts with prefix."""
+        try:
+            rows = self._conn().execute(
+                "SELECT key, value FROM kv WHERE key >= ? AND key < ? AND expires_at > ?",
+                (prefix, prefix + "￿", time.time()),
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("⚠️ Shared cache scan failed: %s", e)
+            return []
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def purge_expired(self):
+        try:
+            return self._conn().execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),)).rowcount
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("⚠️ Shared cache purge failed: %s", e)
+            return 0
+
+    def stats(self):
+        try:
+            size = self._conn().execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        return {
+            "name": self.name,
+            "path": self.path,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
+
+
+class LeaderLock:
+    """
+    Non-blocking exclusive flock on a file; the holder is the leader.
+    The OS releases the lock when the holding process exits, so another
+    worker can take over on its next try_acquire().
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows): only single-process deployments make sense
+            self._fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+        self._fd = None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Process-wide SharedCache, or None when SHARED_CACHE_ENABLED is off."""
+    global _shared
+    if not SHARED_CACHE_ENABLED:
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = SharedCache(SHARED_CACHE_PATH)
+                logger.info("🗄️ Shared cache at %s", SHARED_CACHE_PATH)
+    return _shared
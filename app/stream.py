@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from app.config import STREAM_QUEUE_SIZE, STREAM_MAX_SUBSCRIBERS
+from app.log import get_logger
+from app.metrics import register_collector
+
+logger = get_logger("stream")
+
+
+class Message:
+    """One update, serialized once and shared by every subscriber."""
+    __slots__ = ("city", "json", "sse")
+
+    def __init__(self, seq, city, payload):
+        self.city = city
+        self.json = json.dumps(payload, separators=(",", ":"))
+        self.sse = f"id: {seq}\nevent: aqi\ndata: {self.json}\n\n".encode()
+
+
+class Subscriber:
+    """
+    A client's bounded mailbox. When a slow consumer lets it fill up, the
+    oldest message is dropped so the hub never blocks and memory stays
+    bounded at STREAM_QUEUE_SIZE messages per connection.
+    """
+    def __init__(self, cities, maxsize=STREAM_QUEUE_SIZE):
+        self.cities = cities
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, message):
+        """Enqueue without blocking; True if an older message was dropped."""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+        return dropped
+
+    async def next(self, timeout=None):
+        """Next message, or None if nothing arrives within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """
+    Fan-out of per-city AQI updates to stream subscribers.
+
+    publish() is a no-op unless the city's AQI or prediction changed. The
+    latest message per city is kept so new subscribers start with the
+    current state. Must be used from the event loop thread.
+    """
+    def __init__(self, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._by_city = {}      # city -> set of Subscriber
+        self._latest = {}       # city -> (change key, Message)
+        self._count = 0
+        self._seq = 0
+
+        self.published = 0
+        self.deliveries = 0
+        self.dropped = 0
+
+    @property
+    def full(self):
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, cities):
+        """Register a subscriber for the given cities; None when at capacity."""
+        if self.full:
+            return None
+        cities = frozenset(cities)
+        # Room for the current state of every city plus queued updates
+        sub = Subscriber(cities, maxsize=max(STREAM_QUEUE_SIZE, len(cities)))
+        for city in sub.cities:
+            self._by_city.setdefault(city, set()).add(sub)
+            latest = self._latest.get(city)
+            if latest is not None:
+                sub.offer(latest[1])
+        self._count += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        for city in sub.cities:
+            subs = self._by_city.get(city)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_city[city]
+        self._count -= 1
+
+    def publish(self, city, payload):
+        """Broadcast payload for city if it changed; returns True if sent."""
+        key = (payload.get("current_aqi"), payload.get("predicted_next_day"))
+        latest = self._latest.get(city)
+        if latest is not None and latest[0] == key:
+            return False
+
+        self._seq += 1
+        message = Message(self._seq, city, {**payload, "published_at": int(time.time())})
+        self._latest[city] = (key, message)
+        self.published += 1
+
+        for sub in self._by_city.get(city, ()):
+            if sub.offer(message):
+                self.dropped += 1
+            self.deliveries += 1
+        return True
+
+    def stats(self):
+        return {
+            "subscribers": self._count,
+            "max_subscribers": self.max_subscribers,
+            "cities_tracked": len(self._latest),
+            "published": self.published,
+            "deliveries": self.deliveries,
+            "dropped": self.dropped,
+        }
+
+
+hub = Hub()
+
+
+def _collect():
+    s = hub.stats()
+    return [
+        ("aqi_stream_subscribers", "gauge", "Open stream subscriptions", [({}, s["subscribers"])]),
+        ("aqi_stream_published_total", "counter", "City updates broadcast", [({}, s["published"])]),
+        ("aqi_stream_dropped_total", "counter", "Messages dropped for slow consumers", [({}, s["dropped"])]),
+    ]
+
+
+register_collector(_collect)
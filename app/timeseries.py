@@ -0,0 +1,235 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.config import HISTORY_MAX_POINTS
+from app.database import AQIHourly, AQIDaily, AQIWeekly, get_engine
+from app.log import get_logger
+from app.metrics import span
+
+logger = get_logger("timeseries")
+
+# Finest to coarsest; each has its own table
+RESOLUTIONS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+# Rows per INSERT statement (keeps SQLite under its bound-parameter limit)
+UPSERT_BATCH = 500
+
+# Touched buckets further apart than this are re-read in separate range scans
+_SPAN_GAP = timedelta(days=7)
+
+
+# ---------------- TIME HELPERS ----------------
+def to_hour(ts):
+    """UTC hour (naive datetime) for a datetime or unix timestamp."""
+    if isinstance(ts, (int, float)):
+        ts = datetime.fromtimestamp(ts, tz=timezone.utc)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def week_start(day):
+    """Monday of the ISO week containing day."""
+    return day - timedelta(days=day.weekday())
+
+
+def _midnight(day):
+    return datetime.combine(day, time())
+
+
+def _spans(days):
+    """Group sorted dates into (first, last) runs without large gaps."""
+    spans = []
+    for day in sorted(days):
+        if spans and day - spans[-1][1] <= _SPAN_GAP:
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+# ---------------- INGEST ----------------
+def _upsert(conn, table, rows, keys):
+    insert = sqlite_insert if conn.dialect.name == "sqlite" else pg_insert
+    columns = [c.name for c in table.columns if c.name not in keys]
+    for i in range(0, len(rows), UPSERT_BATCH):
+        stmt = insert(table).values(rows[i:i + UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: stmt.excluded[name] for name in columns},
+        )
+        conn.execute(stmt)
+
+
+def _merge(acc, count, total, lo, hi):
+    if acc is None:
+        return [count, total, lo, hi]
+    acc[0] += count
+    acc[1] += total
+    acc[2] = min(acc[2], lo)
+    acc[3] = max(acc[3], hi)
+    return acc
+
+
+def _rebuild_daily(conn, touched):
+    """Recompute aqi_daily rows for the touched (city, day) buckets from aqi_hourly."""
+    hourly = AQIHourly.__table__
+    by_city = defaultdict(set)
+    for city, day in touched:
+        by_city[city].add(day)
+
+    rows = []
+    for city, days in by_city.items():
+        for first, last in _spans(days):
+            acc = {}
+            stmt = select(hourly.c.ts, hourly.c.aqi).where(
+                hourly.c.city == city,
+                hourly.c.ts >= _midnight(first),
+                hourly.c.ts < _midnight(last + timedelta(days=1)),
+            )
+            for ts, aqi in conn.execute(stmt):
+                day = ts.date()
+                if day in days:
+                    acc[day] = _merge(acc.get(day), 1, aqi, aqi, aqi)
+            rows.extend(
+                {"city": city, "day": day, "count": c, "sum": s, "min": lo, "max": hi}
+                for day, (c, s, lo, hi) in acc.items()
+            )
+
+    if rows:
+        _upsert(conn, AQIDaily.__table__, rows, ["city", "day"])
+
+
+def _rebuild_weekly(conn, touched):
+    """Recompute aqi_weekly rows for the touched (city, week_start) buckets from aqi_daily."""
+    daily = AQIDaily.__table__
+    by_city = defaultdict(set)
+    for city, week in touched:
+        by_city[city].add(week)
+
+    rows = []
+    for city, weeks in by_city.items():
+        for first, last in _spans(weeks):
+            acc = {}
+            stmt = select(daily.c.day, daily.c.count, daily.c.sum, daily.c.min, daily.c.max).where(
+                daily.c.city == city,
+                daily.c.day >= first,
+                daily.c.day < last + timedelta(weeks=1),
+            )
+            for day, count, total, lo, hi in conn.execute(stmt):
+                week = week_start(day)
+                if week in weeks:
+                    acc[week] = _merge(acc.get(week), count, total, lo, hi)
+            rows.extend(
+                {"city": city, "week_start": week, "count": c, "sum": s, "min": lo, "max": hi}
+                for week, (c, s, lo, hi) in acc.items()
+            )
+
+    if rows:
+        _upsert(conn, AQIWeekly.__table__, rows, ["city", "week_start"])
+
+
+def ingest_hourly(rows):
+    """
+    Upsert hourly readings ({city, ts, aqi, source}; ts is a datetime or
+    unix time, truncated to the UTC hour) and refresh the daily and weekly
+    rollups for just the buckets they touch, all in one transaction.
+    Re-ingesting an hour overwrites it and the rollups follow.
+    """
+    deduped = {}
+    for r in rows:
+        ts = to_hour(r["ts"])
+        deduped[(r["city"], ts)] = {
+            "city": r["city"], "ts": ts, "aqi": float(r["aqi"]), "source": r.get("source", "unknown"),
+        }
+    if not deduped:
+        return 0
+
+    touched_days = {(city, ts.date()) for city, ts in deduped}
+    touched_weeks = {(city, week_start(day)) for city, day in touched_days}
+
+    with span("db_write"), get_engine().begin() as conn:
+        _upsert(conn, AQIHourly.__table__, list(deduped.values()), ["city", "ts"])
+        _rebuild_daily(conn, touched_days)
+        _rebuild_weekly(conn, touched_weeks)
+
+    logger.debug(
+        "📈 Ingested %s hourly rows (%s days, %s weeks)",
+        len(deduped), len(touched_days), len(touched_weeks),
+    )
+    return len(deduped)
+
+
+# ---------------- QUERY ----------------
+def choose_resolution(start, end, resolution="auto", max_points=HISTORY_MAX_POINTS):
+    """
+    The requested resolution, or for "auto" the finest one whose point
+    count over [start, end) fits in max_points (so a year reads ~52 weekly
+    or 365 daily rows, never 8760 hourly ones).
+    """
+    if resolution != "auto":
+        return resolution
+    for name, step in RESOLUTIONS.items():
+        if (end - start) / step <= max_points:
+            return name
+    return "week"
+
+
+def _ceil_day(ts):
+    return ts.date() if ts.time() == time() else ts.date() + timedelta(days=1)
+
+
+def query_history(city, start, end, resolution="auto"):
+    """
+    AQI points for city over [start, end) (naive UTC datetimes), read from
+    the table matching the resolution: aqi_hourly, aqi_daily or aqi_weekly.
+    Daily/weekly points cover every bucket overlapping the range.
+    """
+    resolution = choose_resolution(start, end, resolution)
+
+    if resolution == "hour":
+        table = AQIHourly.__table__
+        stmt = (
+            select(table.c.ts, table.c.aqi)
+            .where(table.c.city == city, table.c.ts >= start, table.c.ts < end)
+            .order_by(table.c.ts)
+        )
+        with span("db_query"), get_engine().connect() as conn:
+            points = [
+                {"t": ts.isoformat(), "mean": aqi, "min": aqi, "max": aqi, "count": 1}
+                for ts, aqi in conn.execute(stmt)
+            ]
+    else:
+        if resolution == "day":
+            table = AQIDaily.__table__
+            key = table.c.day
+            lo, hi = start.date(), _ceil_day(end)
+        else:
+            table = AQIWeekly.__table__
+            key = table.c.week_start
+            lo, hi = week_start(start.date()), _ceil_day(end)
+        stmt = (
+            select(key, table.c.count, table.c.sum, table.c.min, table.c.max)
+            .where(table.c.city == city, key >= lo, key < hi)
+            .order_by(key)
+        )
+        with span("db_query"), get_engine().connect() as conn:
+            points = [
+                {"t": bucket.isoformat(), "mean": round(total / count, 2), "min": lo_, "max": hi_, "count": count}
+                for bucket, count, total, lo_, hi_ in conn.execute(stmt)
+            ]
+
+    return {
+        "city": city,
+        "resolution": resolution,
+        "table": table.name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": points,
+    }
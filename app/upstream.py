@@ -0,0 +1,64 @@
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import UPSTREAM_TIMEOUT, UPSTREAM_MAX_CONNECTIONS, UPSTREAM_MAX_KEEPALIVE
+
+# Shared, keep-alive HTTP clients for OpenWeather and WAQI.
+# The sync Session serves background jobs and scripts, the async client
+# serves the FastAPI request path.
+
+_session = None
+_session_lock = threading.Lock()
+
+_async_client = None
+
+
+def get_session():
+    """Return the process-wide pooled requests.Session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=UPSTREAM_MAX_KEEPALIVE,
+                    pool_maxsize=UPSTREAM_MAX_CONNECTIONS,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """Return the pooled httpx.AsyncClient, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=UPSTREAM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            ),
+        )
+    return _async_client
+
+
+def get(url, params=None, timeout=UPSTREAM_TIMEOUT):
+    return get_session().get(url, params=params, timeout=timeout)
+
+
+async def get_async(url, params=None, timeout=UPSTREAM_TIMEOUT):
+    return await get_async_client().get(url, params=params, timeout=timeout)
+
+
+async def close_clients():
+    """Close pooled connections (called on app shutdown)."""
+    global _async_client, _session
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _session is not None:
+        _session.close()
+        _session = None
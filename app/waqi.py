@@ -1,20 +1,64 @@
-import requests
-from dotenv import load_dotenv
 import os
+from app import upstream
+from app.config import (
+    WAQI_WORKER_RATE, WAQI_WORKER_BURST, WAQI_RATE_WAIT, WAQI_BASE_URL,
+    BREAKER_FAILURES, BREAKER_RESET_SECONDS, STALE_AFTER_SECONDS, STALE_TTL,
+)
+from app.guard import UpstreamGuard, guard_collector
+from app.metrics import UPSTREAM_ERRORS, register_collector, span
 
-load_dotenv()
 TOKEN = os.getenv("WAQI_TOKEN")
 
-def fetch_city_aqi(city):
-    url = f"https://api.waqi.info/feed/{city}/?token={TOKEN}"
-    r = requests.get(url).json()
+WAQI_FEED_URL = f"{WAQI_BASE_URL}/feed"
+
+# Shared across threads and the event loop so every WAQI call counts
+waqi_guard = UpstreamGuard(
+    "waqi", WAQI_WORKER_RATE, WAQI_WORKER_BURST,
+    max_wait=WAQI_RATE_WAIT,
+    failure_threshold=BREAKER_FAILURES,
+    reset_timeout=BREAKER_RESET_SECONDS,
+    stale_after=STALE_AFTER_SECONDS,
+    stale_ttl=STALE_TTL,
+)
+register_collector(guard_collector(waqi_guard))
+
+def _parse_feed(r):
     if r["status"] != "ok":
+        UPSTREAM_ERRORS.inc("waqi", "status")
         return None
     return r["data"]["aqi"]
 
-def fetch_online_aqi_latlon(lat, lon):
-    url = f"https://api.waqi.info/feed/geo:{lat};{lon}/?token={TOKEN}"
-    r = requests.get(url).json()
-    if r["status"] != "ok":
+def _feed_payload(res):
+    """Feed JSON, or None when WAQI itself failed (counts against the breaker)."""
+    if res.status_code != 200:
+        UPSTREAM_ERRORS.inc("waqi", str(res.status_code))
         return None
-    return r["data"]["aqi"]
+    payload = res.json()
+    # An unknown station is a bad request, not an upstream failure
+    if payload.get("status") != "ok" and payload.get("data") == "Over quota":
+        UPSTREAM_ERRORS.inc("waqi", "quota")
+        return None
+    return payload
+
+def _request_feed(url):
+    try:
+        with span("upstream_waqi"):
+            return _feed_payload(upstream.get(url, params={"token": TOKEN}))
+    except Exception as e:
+        UPSTREAM_ERRORS.inc("waqi", type(e).__name__)
+        raise
+
+def _get_feed(url):
+    """(payload, stale) through waqi_guard; raises UpstreamUnavailable."""
+    return waqi_guard.call(url, lambda: _request_feed(url))
+
+def fetch_city_reading(city):
+    """(aqi, stale) for a city; stale=True is the last known good reading."""
+    payload, stale = _get_feed(f"{WAQI_FEED_URL}/{city}/")
+    return _parse_feed(payload), stale
+
+def fetch_city_aqi(city):
+    return fetch_city_reading(city)[0]
+
+def fetch_online_aqi_latlon(lat, lon):
+    return _parse_feed(_get_feed(f"{WAQI_FEED_URL}/geo:{lat};{lon}/")[0])
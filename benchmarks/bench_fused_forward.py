@@ -0,0 +1,56 @@
+"""
+Compare NBeatsAQIModel's per-block loop with FusedNBeatsAQIModel.
+
+Reports per-batch latency for several batch sizes and the maximum absolute
+difference between the two outputs.
+
+Run from the repository root:
+    python -m benchmarks.bench_fused_forward --repeats 200
+"""
+import argparse
+import time
+
+import torch
+
+from app.config import MODEL_STATE_PATH
+from app.inference import load_model
+
+
+def time_forward(model, x, repeats):
+    with torch.no_grad():
+        for _ in range(10):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(x)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=MODEL_STATE_PATH)
+    parser.add_argument("--batch-sizes", default="1,8,32,128,512")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model = load_model(args.model, fused=False)
+    fused = model.fuse()
+
+    print(f"{'batch':>6} {'loop ms':>10} {'fused ms':>10} {'speedup':>8} {'max |diff|':>12}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        x = torch.randn(batch_size, model.input_size)
+        with torch.no_grad():
+            diff = (model(x) - fused(x)).abs().max().item()
+
+        loop_s = time_forward(model, x, args.repeats)
+        fused_s = time_forward(fused, x, args.repeats)
+        print(
+            f"{batch_size:>6} {loop_s * 1e3:>10.3f} {fused_s * 1e3:>10.3f} "
+            f"{loop_s / fused_s:>7.2f}x {diff:>12.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
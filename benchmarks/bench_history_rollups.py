@@ -0,0 +1,102 @@
+"""
+Time one-year /history queries against years of hourly AQI data.
+
+Fills a throwaway SQLite database with synthetic hourly readings through
+timeseries.ingest_hourly (which maintains the daily/weekly rollups), then
+compares a one-year query per resolution with aggregating the raw hourly
+rows on the fly.
+
+Run from the repository root:
+    python -m benchmarks.bench_history_rollups --years 5 --cities 3
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def synthetic_rows(city, start, hours, rng):
+    for h in range(hours):
+        ts = start + timedelta(hours=h)
+        seasonal = 60 * math.sin(2 * math.pi * h / (24 * 365))
+        daily = 20 * math.sin(2 * math.pi * h / 24)
+        yield {"city": city, "ts": ts, "aqi": max(5.0, 120 + seasonal + daily + rng.gauss(0, 15)),
+               "source": "synthetic"}
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--cities", type=int, default=3)
+    parser.add_argument("--batch-hours", type=int, default=24 * 7)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "history_bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    # Imported after DATABASE_URL is set: app.database reads it at import
+    from sqlalchemy import func, select
+    from app.database import AQIHourly, get_engine
+    from app.timeseries import ingest_hourly, query_history
+
+    rng = random.Random(0)
+    first = datetime(2026 - args.years, 1, 1)
+    hours = args.years * 365 * 24
+    cities = [f"City{i}" for i in range(args.cities)]
+
+    start = time.perf_counter()
+    for city in cities:
+        batch = []
+        for row in synthetic_rows(city, first, hours, rng):
+            batch.append(row)
+            if len(batch) == args.batch_hours:
+                ingest_hourly(batch)
+                batch = []
+        if batch:
+            ingest_hourly(batch)
+    elapsed = time.perf_counter() - start
+    total = hours * len(cities)
+    print(f"ingested {total} hourly rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s incl. rollups)")
+
+    end = first + timedelta(days=365 * args.years)
+    q_start = end - timedelta(days=365)
+    city = cities[0]
+
+    print(f"{'query (1 year)':<24} {'points':>7} {'ms':>9}")
+    for resolution in ("hour", "day", "week", "auto"):
+        seconds, result = best_of(lambda: query_history(city, q_start, end, resolution), args.repeats)
+        label = f"{resolution} -> {result['table']}"
+        print(f"{label:<24} {len(result['points']):>7} {seconds * 1e3:>9.2f}")
+
+    hourly = AQIHourly.__table__
+    day = func.date(hourly.c.ts)
+    stmt = (
+        select(day, func.count(), func.avg(hourly.c.aqi), func.min(hourly.c.aqi), func.max(hourly.c.aqi))
+        .where(hourly.c.city == city, hourly.c.ts >= q_start, hourly.c.ts < end)
+        .group_by(day)
+        .order_by(day)
+    )
+
+    def on_the_fly():
+        with get_engine().connect() as conn:
+            return conn.execute(stmt).fetchall()
+
+    seconds, rows = best_of(on_the_fly, args.repeats)
+    print(f"{'GROUP BY over hourly':<24} {len(rows):>7} {seconds * 1e3:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare StationIndex (KD-tree on the unit sphere) against a linear
+haversine scan for nearest / k-nearest station lookups.
+
+Run from the repository root:
+    python -m benchmarks.bench_spatial_index --stations 5000 --queries 2000
+"""
+import argparse
+import random
+import time
+
+from app.geo import StationIndex, haversine
+
+# Rough bounding box of India
+LAT_RANGE = (8.0, 35.0)
+LON_RANGE = (68.0, 97.0)
+
+
+def random_points(n, rng):
+    return [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(n)]
+
+
+def linear_k_nearest(stations, lat, lon, k):
+    dists = sorted(
+        (haversine(lat, lon, slat, slon), name)
+        for name, (slat, slon) in stations.items()
+    )
+    return [(name, d) for d, name in dists[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stations = {f"station-{i}": p for i, p in enumerate(random_points(args.stations, rng))}
+    queries = random_points(args.queries, rng)
+
+    t0 = time.perf_counter()
+    index = StationIndex(stations)
+    build = time.perf_counter() - t0
+
+    results = {}
+    for label, fn in [
+        ("linear nearest", lambda q: linear_k_nearest(stations, q[0], q[1], 1)),
+        ("index nearest", lambda q: [index.nearest(q[0], q[1])]),
+        (f"linear k={args.k}", lambda q: linear_k_nearest(stations, q[0], q[1], args.k)),
+        (f"index k={args.k}", lambda q: index.k_nearest(q[0], q[1], args.k)),
+    ]:
+        t0 = time.perf_counter()
+        results[label] = [fn(q) for q in queries]
+        elapsed = time.perf_counter() - t0
+        print(f"{label:>16}: {elapsed / len(queries) * 1e6:10.1f} us/query")
+
+    # Both methods must agree on names (distances differ only by rounding)
+    mismatches = sum(
+        [n for n, _ in a] != [n for n, _ in b]
+        for a, b in zip(results[f"linear k={args.k}"], results[f"index k={args.k}"])
+    )
+    print(f"\nstations={args.stations} queries={args.queries} build={build * 1e3:.1f} ms")
+    print(f"k-nearest mismatches vs linear scan: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
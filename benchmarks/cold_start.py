@@ -0,0 +1,126 @@
+"""
+Measure cold start: time from process launch until /health answers and
+until /ready reports warm, plus the import time of main.py. Each run starts
+a fresh `uvicorn main:app`; the run fails if the median exceeds the budget.
+
+    python -m benchmarks.cold_start --runs 5 --json cold_start.json
+
+Budgets default to what the autoscaler tolerates with headroom; exit code 1
+when exceeded so it can gate a release.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Executed in a fresh interpreter so nothing is already imported
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _env(extra):
+    env = {
+        **os.environ,
+        "OPENWEATHER_API_KEY": os.getenv("OPENWEATHER_API_KEY", "fake"),
+        # The refresher would start hitting the network; it is not part of startup
+        "REFRESH_ENABLED": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    env.update(extra)
+    return env
+
+
+def measure_import(env):
+    out = subprocess.check_output([sys.executable, "-c", _IMPORT_SNIPPET], env=env, text=True)
+    return float(out.strip().splitlines()[-1])
+
+
+def _poll(client, path, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    return False
+
+
+def measure_startup(port, env, timeout):
+    """Seconds from spawn to first 200 on /health and on /ready."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        deadline = start + timeout
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            if not _poll(client, "/health", deadline):
+                raise RuntimeError(f"/health not up within {timeout}s")
+            healthy = time.perf_counter() - start
+            if not _poll(client, "/ready", deadline):
+                raise RuntimeError(f"/ready not up within {timeout}s")
+            ready = time.perf_counter() - start
+            components = client.get("/ready").json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return healthy, ready, components
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--health-budget", type=float, default=3.0, help="seconds until /health")
+    parser.add_argument("--ready-budget", type=float, default=10.0, help="seconds until /ready")
+    parser.add_argument("--backend", help="override MODEL_BACKEND")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    env = _env({"MODEL_BACKEND": args.backend} if args.backend else {})
+    imports, healthy, ready = [], [], []
+    components = None
+    for _ in range(args.runs):
+        imports.append(measure_import(env))
+        h, r, components = measure_startup(args.port, env, args.timeout)
+        healthy.append(h)
+        ready.append(r)
+
+    def summary(values):
+        return {"median": round(statistics.median(values), 3), "max": round(max(values), 3)}
+
+    report = {
+        "runs": args.runs,
+        "backend": env.get("MODEL_BACKEND", "numpy"),
+        "import_main_s": summary(imports),
+        "time_to_health_s": summary(healthy),
+        "time_to_ready_s": summary(ready),
+        "budget_s": {"health": args.health_budget, "ready": args.ready_budget},
+        "last_ready": components,
+    }
+    within = (
+        report["time_to_health_s"]["median"] <= args.health_budget
+        and report["time_to_ready_s"]["median"] <= args.ready_budget
+    )
+    report["within_budget"] = within
+
+    print(f"import main : {report['import_main_s']}")
+    print(f"/health     : {report['time_to_health_s']} (budget {args.health_budget}s)")
+    print(f"/ready      : {report['time_to_ready_s']} (budget {args.ready_budget}s)")
+    print("✅ within budget" if within else "❌ over budget")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    main()
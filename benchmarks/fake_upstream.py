@@ -0,0 +1,132 @@
+"""
+Local stand-in for the OpenWeather air-pollution API and the WAQI feed API.
+
+Serves realistic payloads with configurable latency and error rate and
+counts every call, so load tests never touch the real upstreams or quota.
+
+    python -m benchmarks.fake_upstream --port 9000 --latency-ms 80 --error-rate 0.01
+
+Then start the API with:
+    OPENWEATHER_BASE_URL=http://127.0.0.1:9000/data/2.5
+    WAQI_BASE_URL=http://127.0.0.1:9000
+
+Control endpoints: GET /__stats (call counts), POST /__reset.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import zlib
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake OpenWeather / WAQI upstream")
+
+settings = {"latency_ms": 50.0, "jitter_ms": 20.0, "error_rate": 0.0, "error_status": 500}
+calls = Counter()
+
+
+def _pm25(lat, lon, hour):
+    """Smooth, location-dependent PM2.5 with a daily cycle (15-120 µg/m³)."""
+    base = 45 + 25 * math.sin(lat * 1.7) + 20 * math.cos(lon * 1.3)
+    daily = 15 * math.sin(2 * math.pi * (hour % 24) / 24)
+    return round(max(3.0, base + daily + random.uniform(-4, 4)), 2)
+
+
+def _components(pm25):
+    return {
+        "co": round(pm25 * 9.5, 2), "no": round(pm25 * 0.02, 2), "no2": round(pm25 * 0.4, 2),
+        "o3": round(60 + pm25 * 0.2, 2), "so2": round(pm25 * 0.15, 2), "pm2_5": pm25,
+        "pm10": round(pm25 * 1.6, 2), "nh3": round(pm25 * 0.05, 2),
+    }
+
+
+def _item(lat, lon, dt):
+    pm25 = _pm25(lat, lon, dt // 3600)
+    return {"main": {"aqi": min(5, 1 + int(pm25 // 30))}, "components": _components(pm25), "dt": dt}
+
+
+async def _simulate(kind):
+    """Apply latency and maybe fail; returns an error Response or None."""
+    calls[kind] += 1
+    delay = settings["latency_ms"] + random.uniform(-1, 1) * settings["jitter_ms"]
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if random.random() < settings["error_rate"]:
+        calls[f"{kind}_errors"] += 1
+        return JSONResponse({"cod": settings["error_status"], "message": "fake upstream error"},
+                            status_code=settings["error_status"])
+    return None
+
+
+@app.get("/data/2.5/air_pollution")
+async def air_pollution(lat: float, lon: float, appid: str = ""):
+    error = await _simulate("openweather_current")
+    if error:
+        return error
+    now = int(time.time()) // 3600 * 3600
+    return {"coord": {"lon": lon, "lat": lat}, "list": [_item(lat, lon, now)]}
+
+
+@app.get("/data/2.5/air_pollution/forecast")
+async def air_pollution_forecast(lat: float, lon: float, appid: str = ""):
+    error = await _simulate("openweather_forecast")
+    if error:
+        return error
+    start = int(time.time()) // 3600 * 3600 + 3600
+    return {"coord": {"lon": lon, "lat": lat}, "list": [_item(lat, lon, start + 3600 * h) for h in range(96)]}
+
+
+@app.get("/feed/{station}/")
+async def waqi_feed(station: str, token: str = ""):
+    error = await _simulate("waqi")
+    if error:
+        return error
+    if station.startswith("geo:"):
+        lat, lon = (float(v) for v in station[4:].split(";"))
+    else:
+        # Stable pseudo-location per city name (crc32, unlike hash(), is the
+        # same in every process)
+        lat, lon = 8 + (zlib.crc32(station.encode()) % 500) / 100, 76 + (zlib.crc32(station[::-1].encode()) % 500) / 100
+    aqi = int(_pm25(lat, lon, int(time.time()) // 3600) * 1.4)
+    return {
+        "status": "ok",
+        "data": {"aqi": aqi, "idx": zlib.crc32(station.encode()) % 10000, "city": {"name": station, "geo": [lat, lon]}},
+    }
+
+
+@app.get("/__stats")
+def stats():
+    return {"calls": dict(calls), "total": sum(v for k, v in calls.items() if not k.endswith("_errors")),
+            "settings": settings}
+
+
+@app.post("/__reset")
+def reset():
+    calls.clear()
+    return Response(status_code=204)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    parser.add_argument("--error-status", type=int, default=settings["error_status"])
+    args = parser.parse_args()
+
+    settings.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
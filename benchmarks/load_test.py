@@ -0,0 +1,216 @@
+"""
+Load-test /predict/city, /predict/gps and /health at fixed concurrency levels.
+
+For every (scenario, concurrency) pair the harness runs closed-loop workers
+for --duration seconds and reports p50/p95/p99 latency, RPS, errors and the
+number of upstream calls the fake upstream saw during the run.
+
+Against an already running API + fake upstream:
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 \
+        --upstream-url http://127.0.0.1:9000 --json results.json
+
+Or let the harness start both (fake upstream on --upstream-port, API on --port):
+    python -m benchmarks.load_test --spawn --latency-ms 80 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+CITIES = [
+    "Chennai", "Coimbatore", "Madurai", "Salem", "Trichy", "Thanjavur", "Tirunelveli",
+    "Vellore", "Thoothukudi", "Erode", "Karur", "Dindigul", "Kanchipuram", "Nagercoil", "Ooty",
+]
+# Rough Tamil Nadu bounding box for /predict/gps
+GPS_BOX = ((8.1, 13.5), (76.3, 80.3))
+
+SCENARIOS = {
+    "health": lambda: ("/health", None),
+    "predict_city": lambda: ("/predict/city", {"city": random.choice(CITIES)}),
+    "predict_gps": lambda: ("/predict/gps", {
+        "lat": round(random.uniform(*GPS_BOX[0]), 4),
+        "lon": round(random.uniform(*GPS_BOX[1]), 4),
+    }),
+}
+
+
+async def _worker(client, scenario, deadline, latencies, errors):
+    make_request = SCENARIOS[scenario]
+    while time.perf_counter() < deadline:
+        path, params = make_request()
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors.append(1)
+
+
+async def _upstream_stats(upstream_url, reset=False):
+    if not upstream_url:
+        return None
+    async with httpx.AsyncClient(base_url=upstream_url, timeout=5) as client:
+        if reset:
+            await client.post("/__reset")
+            return None
+        return (await client.get("/__stats")).json()
+
+
+async def run_level(base_url, upstream_url, scenario, concurrency, duration):
+    """One closed-loop run; returns a result dict."""
+    await _upstream_stats(upstream_url, reset=True)
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            _worker(client, scenario, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    upstream = await _upstream_stats(upstream_url)
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(lat, 50)), 3),
+            "p95": round(float(np.percentile(lat, 95)), 3),
+            "p99": round(float(np.percentile(lat, 99)), 3),
+            "max": round(float(lat.max()), 3),
+        },
+        "upstream_calls": upstream["calls"] if upstream else None,
+        "upstream_total": upstream["total"] if upstream else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn(args):
+    """Start the fake upstream and the API pointed at it; returns the processes."""
+    upstream = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_upstream", "--port", str(args.upstream_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+    ])
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    env = {
+        **os.environ,
+        "OPENWEATHER_BASE_URL": f"{upstream_url}/data/2.5",
+        "WAQI_BASE_URL": upstream_url,
+        "OPENWEATHER_API_KEY": os.getenv("OPENWEATHER_API_KEY", "fake"),
+        "WAQI_TOKEN": os.getenv("WAQI_TOKEN", "fake"),
+        "REFRESH_ENABLED": "1" if args.refresh else "0",
+        # The fake upstream has no quota; measure the API, not the limiter
+        "OPENWEATHER_RATE_PER_SEC": os.getenv("OPENWEATHER_RATE_PER_SEC", "100000"),
+        "OPENWEATHER_BURST": os.getenv("OPENWEATHER_BURST", "100000"),
+        "WAQI_RATE_PER_SEC": os.getenv("WAQI_RATE_PER_SEC", "100000"),
+        "WAQI_BURST": os.getenv("WAQI_BURST", "100000"),
+        "LOG_LEVEL": "WARNING",
+    }
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+        "--log-level", "warning", "--no-access-log",
+    ], env=env)
+    _wait_ready(f"{upstream_url}/__stats")
+    _wait_ready(f"http://127.0.0.1:{args.port}/health")
+    return [api, upstream], f"http://127.0.0.1:{args.port}", upstream_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--upstream-url", help="fake upstream, for call counts (omit against real APIs)")
+    parser.add_argument("--scenarios", default="health,predict_city,predict_gps")
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--spawn", action="store_true", help="start the fake upstream and the API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upstream-port", type=int, default=9765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--refresh", action="store_true", help="keep the background refresher on")
+    args = parser.parse_args()
+
+    procs = []
+    base_url, upstream_url = args.base_url, args.upstream_url
+    if args.spawn:
+        procs, base_url, upstream_url = spawn(args)
+
+    results = []
+    try:
+        print(f"{'scenario':<13} {'conc':>5} {'reqs':>7} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} {'upstream':>9}")
+        for scenario in args.scenarios.split(","):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                r = asyncio.run(run_level(base_url, upstream_url, scenario, concurrency, args.duration))
+                results.append(r)
+                lat = r["latency_ms"]
+                print(
+                    f"{scenario:<13} {concurrency:>5} {r['requests']:>7} {r['rps']:>9.1f} "
+                    f"{lat['p50']:>8.2f} {lat['p95']:>8.2f} {lat['p99']:>8.2f} {r['errors']:>5} "
+                    f"{r['upstream_total'] if r['upstream_total'] is not None else '-':>9}"
+                )
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": base_url,
+            "duration_s": args.duration,
+            "upstream": {
+                "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+            } if args.spawn else None,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
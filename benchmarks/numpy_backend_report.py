@@ -0,0 +1,97 @@
+"""
+Check the NumPy N-BEATS backend against the torch model and measure the
+cold-start cost of each backend.
+
+- parity: max |torch - numpy| over random AQI windows
+- startup: import + load time and peak RSS, each in a fresh interpreter
+
+Run from the repository root (after `python convert_model.py npz` / `artifact`):
+    python -m benchmarks.numpy_backend_report
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# Executed in a child process so each backend starts cold
+_STARTUP_SNIPPET = """
+import json, resource, sys, time
+
+def peak_rss_mb():
+    # VmHWM resets on exec; ru_maxrss can carry over from the parent on Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = time.perf_counter()
+from app.inference import load_backend
+model = load_backend({backend!r})
+import numpy as np
+model(np.zeros((1, 30), dtype=np.float32))
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "backend": {backend!r},
+    "startup_seconds": round(elapsed, 3),
+    "peak_rss_mb": round(peak_rss_mb(), 1),
+    "torch_imported": "torch" in sys.modules,
+}}))
+"""
+
+
+def parity(samples, seed):
+    from app.inference import TorchBackend, load_model, normalize_windows
+    from app.config import MODEL_NPZ_PATH, MODEL_ARTIFACT_PATH
+    from app.model_np import NumpyNBeatsModel
+
+    rng = np.random.default_rng(seed)
+    windows = rng.uniform(5, 300, size=(samples, 30)).astype(np.float32)
+    normalized, _, _ = normalize_windows(windows)
+
+    reference = TorchBackend(load_model(fused=False))(normalized)
+    diffs = {}
+    for path in (MODEL_NPZ_PATH, MODEL_ARTIFACT_PATH):
+        if os.path.exists(path):
+            out = NumpyNBeatsModel.load(path)(normalized)
+            diffs[os.path.basename(path)] = float(np.abs(reference - out).max())
+    return diffs
+
+
+def startup(backend):
+    out = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SNIPPET.format(backend=backend)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    # Startup first, before this process has imported torch
+    for backend in ("numpy", "torch"):
+        print(json.dumps(startup(backend)))
+
+    failed = False
+    for name, max_diff in parity(args.samples, args.seed).items():
+        status = "OK" if max_diff <= args.tolerance else "FAIL"
+        failed = failed or status != "OK"
+        print(f"parity ({name}): max |torch - numpy| = {max_diff:.2e} over {args.samples} windows [{status}]")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Accuracy/latency report for the dynamic int8 N-BEATS model.
+
+Builds every 30-day window (with its next-day target) from data/*.csv,
+runs the float and int8 models over them and reports:
+- MAE against the observed next-day AQI for both models
+- drift between the two models (mean / max |float - int8|)
+- per-batch latency for several batch sizes
+
+Run from the repository root:
+    python -m benchmarks.quantization_report --json quantization.json
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from app.config import DATA_DIR, MODEL_INPUT_SIZE
+from app.inference import TorchBackend, load_model, normalize_windows
+
+
+def load_windows(data_dir=DATA_DIR, size=MODEL_INPUT_SIZE):
+    """Return (windows [n, size], next-day targets [n]) across all city CSVs."""
+    windows, targets = [], []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        with open(path, newline="") as f:
+            rows = sorted(csv.DictReader(f), key=lambda r: r["date"])
+        values = np.array([float(r["aqi"]) for r in rows if r["aqi"]], dtype=np.float32)
+        for end in range(size, len(values)):
+            windows.append(values[end - size:end])
+            targets.append(values[end])
+    return np.stack(windows), np.array(targets, dtype=np.float32)
+
+
+def predict(backend, windows):
+    normalized, mean, std = normalize_windows(windows)
+    return backend(normalized) * std + mean
+
+
+def time_batches(backend, windows, batch_size, repeats):
+    idx = np.arange(batch_size) % len(windows)
+    batch, _, _ = normalize_windows(windows[idx])
+    for _ in range(5):
+        backend(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend(batch)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", default="1,16,64,256")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    windows, targets = load_windows()
+
+    models = {
+        "float32": TorchBackend(load_model(fused=False)),
+        "int8": TorchBackend(load_model(quantized=True)),
+    }
+    preds = {name: predict(backend, windows) for name, backend in models.items()}
+    drift = np.abs(preds["float32"] - preds["int8"])
+
+    report = {
+        "windows": int(len(windows)),
+        "mae": {name: float(np.abs(p - targets).mean()) for name, p in preds.items()},
+        "drift_mean": float(drift.mean()),
+        "drift_max": float(drift.max()),
+        "latency_ms": {
+            name: {
+                str(b): round(time_batches(backend, windows, b, args.repeats), 4)
+                for b in (int(x) for x in args.batch_sizes.split(","))
+            }
+            for name, backend in models.items()
+        },
+    }
+
+    print(f"windows: {report['windows']} (from {DATA_DIR})")
+    for name, mae in report["mae"].items():
+        print(f"MAE {name:>8}: {mae:.3f}")
+    print(f"drift: mean {report['drift_mean']:.4f}, max {report['drift_max']:.4f} AQI")
+    print(f"\n{'batch':>6} {'float32 ms':>11} {'int8 ms':>9} {'speedup':>8}")
+    for b, f_ms in report["latency_ms"]["float32"].items():
+        q_ms = report["latency_ms"]["int8"][b]
+        print(f"{b:>6} {f_ms:>11.4f} {q_ms:>9.4f} {f_ms / q_ms:>7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,111 @@
-import torch
+import argparse
+import os
+import time
 
-OLD_MODEL_PATH = "model/nbeats_aqi.pth"   # your existing model
-NEW_MODEL_PATH = "model/nbeats_state.pth"  # clean output
+# Model conversion CLI
+#
+#   python convert_model.py state     # full pickled module -> state_dict .pth
+#   python convert_model.py npz       # state_dict .pth -> remapped .npz
+#   python convert_model.py artifact  # state_dict .pth or .npz -> mmap artifact
+#   python convert_model.py verify    # check an artifact's header and checksum
+
+OLD_MODEL_PATH = "model/nbeats_aqi.pth"          # your existing model
+NEW_MODEL_PATH = "model/nbeats_state.pth"        # clean output
+STATE_DICT_PATH = "model/nbeats_state_dict.pth"  # 'parameters.X' state dict
+NPZ_PATH = "model/nbeats_weights.npz"
+ARTIFACT_PATH = "model/nbeats_aqi.aqim"
 
 DEVICE = "cpu"
 
-# Load FULL model object
-full_model = torch.load(OLD_MODEL_PATH, map_location=DEVICE)
 
-# Extract weights safely
-state_dict = full_model.state_dict()
+def convert_state(args):
+    import torch
+
+    # Load FULL model object
+    full_model = torch.load(args.input, map_location=DEVICE, weights_only=False)
+
+    # Extract weights safely
+    state_dict = full_model.state_dict()
+
+    # Save only weights
+    torch.save(state_dict, args.output)
+
+    print("✅ State_dict extracted successfully")
+    print(f"Saved to: {args.output}")
+
+
+def convert_npz(args):
+    from export_numpy import export_npz
+
+    arrays = export_npz(args.input, args.output)
+    print(f"✅ Exported {len(arrays)} tensors")
+    print(f"Saved to: {args.output}")
+
+
+def convert_artifact(args):
+    import numpy as np
+    from app.artifact import write_artifact
+    from app.model_np import fuse_state_dict
+
+    if args.input.endswith(".npz"):
+        with np.load(args.input) as weights:
+            state = {key: weights[key] for key in weights.files}
+    else:
+        # .pth needs torch to unpickle and remap 'parameters.X' keys
+        from export_numpy import remap_state_dict
+        state = remap_state_dict(args.input)
+
+    header = write_artifact(
+        args.output,
+        fuse_state_dict(state),
+        metadata={"model": "NBeatsAQIModel", "layout": "fused", "source": os.path.basename(args.input)},
+    )
+
+    print(f"✅ Wrote artifact v{header['format_version']} with {len(header['tensors'])} tensors")
+    print(f"sha256: {header['sha256']}")
+    print(f"Saved to: {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+
+def verify_artifact(args):
+    from app.artifact import load_artifact
+
+    start = time.perf_counter()
+    header, tensors = load_artifact(args.input)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    params = sum(t.size for t in tensors.values())
+    print(f"✅ {args.input}: format v{header['format_version']}, checksum OK")
+    print(f"{len(tensors)} tensors, {params:,} parameters, loaded in {elapsed:.2f} ms")
+    for name, tensor in tensors.items():
+        print(f"  {name:<6} {tuple(tensor.shape)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="N-BEATS model conversion tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("state", help="extract a state_dict from the pickled model")
+    p.add_argument("--input", default=OLD_MODEL_PATH)
+    p.add_argument("--output", default=NEW_MODEL_PATH)
+    p.set_defaults(func=convert_state)
+
+    p = sub.add_parser("npz", help="export remapped weights to .npz")
+    p.add_argument("--input", default=STATE_DICT_PATH)
+    p.add_argument("--output", default=NPZ_PATH)
+    p.set_defaults(func=convert_npz)
+
+    p = sub.add_parser("artifact", help="write the mmap-able model artifact")
+    p.add_argument("--input", default=STATE_DICT_PATH, help=".pth state dict or .npz")
+    p.add_argument("--output", default=ARTIFACT_PATH)
+    p.set_defaults(func=convert_artifact)
+
+    p = sub.add_parser("verify", help="check an artifact's header and checksum")
+    p.add_argument("input", nargs="?", default=ARTIFACT_PATH)
+    p.set_defaults(func=verify_artifact)
+
+    args = parser.parse_args()
+    args.func(args)
 
-# Save only weights
-torch.save(state_dict, NEW_MODEL_PATH)
 
-print("✅ State_dict extracted successfully")
-print(f"Saved to: {NEW_MODEL_PATH}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import glob
+import io
+import os
+import time
+from datetime import date
+
+# Bulk CSV <-> aqi_records CLI
+#
+#   python db_csv.py import [files...]   # data/*.csv -> aqi_records (upsert on city, date)
+#   python db_csv.py export --out DIR    # aqi_records -> DIR/<City>.csv
+#
+# Needs DATABASE_URL. Rows are streamed in batches of --batch-size, so
+# memory stays flat however large the files are. Postgres loads each batch
+# with COPY into a temp staging table and upserts from there; SQLite uses
+# one executemany INSERT ... ON CONFLICT per batch.
+
+DATA_GLOB = os.path.join("data", "*.csv")
+EXPORT_DIR = "export"
+BATCH_SIZE = 10000
+HEADER = ["city", "date", "latitude", "longitude", "aqi", "source"]
+
+SQLITE_UPSERT = (
+    "INSERT INTO aqi_records (city, date, aqi, source) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (city, date) DO UPDATE SET aqi = excluded.aqi, source = excluded.source"
+)
+PG_STAGING = (
+    "CREATE TEMP TABLE IF NOT EXISTS aqi_records_staging "
+    "(city text, date date, aqi double precision, source text) ON COMMIT DELETE ROWS"
+)
+PG_UPSERT = (
+    "INSERT INTO aqi_records (city, date, aqi, source) "
+    "SELECT city, date, aqi, source FROM aqi_records_staging "
+    "ON CONFLICT (city, date) DO UPDATE SET aqi = excluded.aqi, source = excluded.source"
+)
+
+
+# ---------------- IMPORT ----------------
+def iter_csv_rows(paths):
+    """Yield (city, date, aqi, source) from each file without reading it whole."""
+    for path in paths:
+        default_city = os.path.splitext(os.path.basename(path))[0]
+        with open(path, newline="") as f:
+            for r in csv.DictReader(f):
+                if not r.get("date") or not r.get("aqi"):
+                    continue
+                yield (
+                    r.get("city") or default_city,
+                    date.fromisoformat(r["date"]).isoformat(),
+                    float(r["aqi"]),
+                    r.get("source") or "",
+                )
+
+
+def iter_batches(rows, size):
+    """Batches of rows deduplicated on (city, date); the last row wins."""
+    batch = {}
+    for row in rows:
+        batch[(row[0], row[1])] = row
+        if len(batch) >= size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def _write_sqlite(raw, batch):
+    raw.cursor().executemany(SQLITE_UPSERT, batch)
+    raw.commit()
+
+
+def _write_postgres(raw, batch):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(batch)
+    buf.seek(0)
+    cur = raw.cursor()
+    cur.execute(PG_STAGING)
+    # FORCE_NOT_NULL: an empty source stays "" instead of becoming NULL
+    cur.copy_expert(
+        "COPY aqi_records_staging (city, date, aqi, source) FROM STDIN "
+        "WITH (FORMAT csv, FORCE_NOT_NULL (source))",
+        buf,
+    )
+    cur.execute(PG_UPSERT)
+    # ON COMMIT DELETE ROWS empties the staging table for the next batch
+    raw.commit()
+
+
+def import_csv(args):
+    from app.database import get_engine
+
+    paths = args.files or sorted(glob.glob(DATA_GLOB))
+    engine = get_engine()
+    write = _write_sqlite if engine.dialect.name == "sqlite" else _write_postgres
+
+    read = 0
+    written = 0
+
+    def counted(rows):
+        nonlocal read
+        for row in rows:
+            read += 1
+            yield row
+
+    start = time.perf_counter()
+    raw = engine.raw_connection()
+    try:
+        for batch in iter_batches(counted(iter_csv_rows(paths)), args.batch_size):
+            write(raw, batch)
+            written += len(batch)
+    finally:
+        raw.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Imported {written} rows ({read} read) from {len(paths)} files via {engine.dialect.name}")
+    print(f"  {elapsed:.2f}s, {written / elapsed if elapsed else 0:,.0f} rows/s")
+
+
+# ---------------- EXPORT ----------------
+def export_csv(args):
+    from sqlalchemy import select
+    from app.database import AQIRecord, get_engine
+    from app.db_manager import CITY_COORDS
+
+    os.makedirs(args.out, exist_ok=True)
+    table = AQIRecord.__table__
+    stmt = select(table.c.city, table.c.date, table.c.aqi, table.c.source).order_by(
+        table.c.city, table.c.date
+    )
+
+    written = 0
+    files = 0
+    current = f = writer = None
+    start = time.perf_counter()
+    try:
+        with get_engine().connect() as conn:
+            # Server-side cursor on Postgres: rows arrive in batch-sized chunks
+            result = conn.execution_options(stream_results=True, yield_per=args.batch_size).execute(stmt)
+            for city, day, aqi, source in result:
+                if city != current:
+                    if f is not None:
+                        f.close()
+                    current = city
+                    lat, lon = CITY_COORDS.get(city, ("", ""))
+                    f = open(os.path.join(args.out, f"{city.replace(os.sep, '_')}.csv"), "w", newline="")
+                    writer = csv.writer(f, lineterminator="\n")
+                    writer.writerow(HEADER)
+                    files += 1
+                writer.writerow([city, day.isoformat(), lat, lon, aqi, source])
+                written += 1
+    finally:
+        if f is not None:
+            f.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Exported {written} rows to {files} files in {args.out}")
+    print(f"  {elapsed:.2f}s, {written / elapsed if elapsed else 0:,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk CSV import/export for aqi_records")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="upsert CSV files into aqi_records")
+    p.add_argument("files", nargs="*", help=f"CSV files (default {DATA_GLOB})")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p.set_defaults(func=import_csv)
+
+    p = sub.add_parser("export", help="write aqi_records to one CSV per city")
+    p.add_argument("--out", default=EXPORT_DIR)
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p.set_defaults(func=export_csv)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
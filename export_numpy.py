@@ -0,0 +1,40 @@
+import argparse
+import numpy as np
+import torch
+from app.model_def import NBeatsAQIModel
+
+STATE_DICT_PATH = "model/nbeats_state_dict.pth"   # 'parameters.X' state dict
+NPZ_PATH = "model/nbeats_weights.npz"             # torch-free weights
+
+DEVICE = "cpu"
+
+
+def remap_state_dict(state_dict_path=STATE_DICT_PATH):
+    """Remap 'parameters.X' keys through the model's custom loader."""
+    model = NBeatsAQIModel()
+    state_dict = torch.load(state_dict_path, map_location=DEVICE, weights_only=False)
+    model.load_state_dict(state_dict, strict=True)
+
+    return {
+        name: tensor.detach().cpu().numpy().astype(np.float32)
+        for name, tensor in model.state_dict().items()
+    }
+
+
+def export_npz(state_dict_path=STATE_DICT_PATH, npz_path=NPZ_PATH):
+    arrays = remap_state_dict(state_dict_path)
+    np.savez(npz_path, **arrays)
+    return arrays
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export N-BEATS weights to .npz for the NumPy backend")
+    parser.add_argument("--input", default=STATE_DICT_PATH)
+    parser.add_argument("--output", default=NPZ_PATH)
+    args = parser.parse_args()
+
+    arrays = export_npz(args.input, args.output)
+    params = sum(a.size for a in arrays.values())
+
+    print(f"✅ Exported {len(arrays)} tensors ({params:,} parameters)")
+    print(f"Saved to: {args.output}")
@@ -1,18 +1,130 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 import uvicorn
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv  # ✅ ADDED
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-# Load environment variables
-load_dotenv()  # ✅ ADDED
-
-# Your existing modules
-from app.predictor import predict_city, predict_latlon
+# Your existing modules (app.config loads .env)
+from app.predictor import (
+    CITY_COORDS, predict_city_async, predict_cities_async, predict_latlon_async,
+    forecast_city_async, cache_stats,
+)
+from app import httpcache
+from app.upstream import close_clients
+from app.waqi import waqi_guard
+from app.refresher import lookup_city, snapshot_status, start_refresher, stop_refresher
+from app.inference import get_model_runner, load_backend, start_model_runner, stop_model_runner
+from app.history import get_history_store
+from app.config import (
+    REFRESH_ENABLED, REFRESH_DB_ENABLED, MODEL_ENABLED, MODEL_HISTORY_SOURCE, DATABASE_URL,
+    WEB_WORKERS, STREAM_HEARTBEAT_SECONDS,
+)
+from app.shared_cache import get_shared_cache
+from app.stream import hub
 from app.health import health_recommendation
+from app.log import get_logger
+from app import metrics
+
+logger = get_logger("api")
+
+# ---------------- RESPONSES ----------------
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records serialization time as a metrics stage."""
+    def render(self, content):
+        with metrics.span("serialization"):
+            return super().render(content)
+
+# ---------------- STARTUP ----------------
+# Warm-up state per component: pending, ready, failed or disabled.
+# /health never waits on these; /ready reports them.
+_started_at = time.monotonic()
+_warmup = {"model": "pending", "history": "pending", "database": "pending"}
+_warmup_seconds = {}
+
+
+async def _warm_component(name, enabled, load):
+    """Run a blocking initializer off the event loop and record the outcome."""
+    if not enabled:
+        _warmup[name] = "disabled"
+        return
+    start = time.perf_counter()
+    try:
+        await load()
+        _warmup[name] = "ready"
+    except Exception as e:
+        _warmup[name] = "failed"
+        logger.warning("⚠️ Warm-up of %s failed: %s", name, e)
+    _warmup_seconds[name] = round(time.perf_counter() - start, 3)
+
+
+async def _load_model():
+    backend = await asyncio.to_thread(load_backend)
+    start_model_runner(backend)
+    logger.info("🧠 N-BEATS model loaded, micro-batching runner started")
+
+
+def _connect_db():
+    # Imported here so sqlalchemy stays off the import path of the app
+    from app.database import get_engine
+    get_engine()
+
+
+async def _warm_up():
+    await asyncio.gather(
+        _warm_component("model", MODEL_ENABLED, _load_model),
+        _warm_component(
+            "history", MODEL_HISTORY_SOURCE == "csv",
+            lambda: asyncio.to_thread(get_history_store),
+        ),
+        # Only connect if something will use the database
+        _warm_component(
+            "database",
+            bool(DATABASE_URL) and (REFRESH_DB_ENABLED or MODEL_HISTORY_SOURCE == "db"),
+            lambda: asyncio.to_thread(_connect_db),
+        ),
+    )
+    logger.info("✅ Warm-up finished in %.2fs: %s", time.monotonic() - _started_at, _warmup)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    api_key = os.getenv("OPENWEATHER_API_KEY")  # ✅ ADDED
+    if not api_key:
+        logger.error("❌ ERROR: OPENWEATHER_API_KEY not found!")
+    else:
+        logger.info("🔑 API Key Loaded: %s...", api_key[:10])
+
+    logger.info("🚀 Starting AQI Backend with Real-Time OpenWeather API...")
+    logger.info("✅ All predictions will fetch LIVE data from OpenWeather!")
+
+    # Model, history and DB load in the background so the server starts
+    # accepting connections (and /health answers) straight away; until the
+    # model is up, predictions use the heuristic fallback
+    warmup = asyncio.create_task(_warm_up())
+
+    if REFRESH_ENABLED:
+        start_refresher()
+        logger.info("🔄 Background city refresher started")
+
+    yield
+
+    # ---------------- SHUTDOWN ----------------
+    warmup.cancel()
+    await stop_refresher()
+    await stop_model_runner()
+    await close_clients()
 
 # ---------------- FASTAPI APP ----------------
-app = FastAPI(title="AQI Prediction Backend - Real-Time")
+app = FastAPI(
+    title="AQI Prediction Backend - Real-Time",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan,
+)
 
 # ---------------- CORS ----------------
 app.add_middleware(
@@ -23,26 +135,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ---------------- STARTUP ----------------
-@app.on_event("startup")
-def startup():
-    api_key = os.getenv("OPENWEATHER_API_KEY")  # ✅ ADDED
-    if not api_key:
-        print("❌ ERROR: OPENWEATHER_API_KEY not found!")
-    else:
-        print(f"🔑 API Key Loaded: {api_key[:10]}...")
-        
-    print("🚀 Starting AQI Backend with Real-Time OpenWeather API...")
-    print("✅ All predictions will fetch LIVE data from OpenWeather!")
+# ---------------- REQUEST METRICS ----------------
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (not the raw path) keeps label cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, path)
+        metrics.HTTP_REQUESTS.inc(request.method, path, str(status))
+
+# ---------------- CONDITIONAL RESPONSES ----------------
+def _cached_json(request, resource, body, max_age):
+    """
+    JSON response with a weak ETag and Cache-Control: max-age, or a 304
+    if the client already has this representation.
+    """
+    etag = httpcache.make_etag(body)
+    httpcache.remember(resource, etag, max_age)
+    if httpcache.etag_matches(request.headers.get("if-none-match"), etag):
+        return httpcache.not_modified(etag, max_age)
+    return TimedJSONResponse(body, headers=httpcache.cache_headers(etag, max_age))
+
+
+def _head_response(resource, fallback=None):
+    """
+    Headers-only answer for HEAD probes; never calls upstream. Uses the last
+    ETag served for the resource, else `fallback` (etag, max_age), else
+    no-cache.
+    """
+    known = httpcache.known_validator(resource) or fallback
+    if known is None:
+        return Response(status_code=200, media_type="application/json",
+                        headers=httpcache.cache_headers(None, 0))
+    return Response(status_code=200, media_type="application/json",
+                    headers=httpcache.cache_headers(*known))
 
 # ---------------- CITY PREDICTION ----------------
+def _snapshot_body(city):
+    """(response body, max_age) from the refresher snapshot, or (None, None)."""
+    cached, age = lookup_city(city)
+    if cached is None:
+        return None, None
+    body = {**cached, "snapshot_age_seconds": round(age, 1)}
+    return body, httpcache.snapshot_max_age(age, cached.get("observed_at"))
+
+
 @app.get("/predict/city")
-@app.head("/predict/city")  # ✅ ADDED
-def predict_by_city(city: str):
+async def predict_by_city(city: str, request: Request):
+    resource = ("city", city)
+    # Client already has the current representation: no work at all
+    not_modified = httpcache.check_not_modified(request, resource)
+    if not_modified is not None:
+        return not_modified
+
+    # Fast path: precomputed snapshot from the background refresher
+    body, max_age = _snapshot_body(city)
+    if body is not None:
+        return _cached_json(request, resource, body, max_age)
+
     try:
-        print(f"\n🔍 API Request for city: {city}")
+        logger.debug("🔍 API Request for city: %s", city)
         
-        history, next_day = predict_city(city)
+        history, next_day, stale, observed_at = await predict_city_async(city)
 
         # ✅ FIXED ERROR HANDLING
         if not history or next_day is None:
@@ -58,25 +219,163 @@ def predict_by_city(city: str):
             "current_aqi": int(current),
             "predicted_next_day": int(next_day),
             "health": health_recommendation(next_day),
+            "snapshot_age_seconds": None,
+            "stale": stale,
+            "observed_at": observed_at,
         }
         
-        print(f"✅ Response: {response}")
-        return response
+        logger.debug("✅ Response: %s", response)
+        return _cached_json(request, resource, response, httpcache.live_max_age(observed_at, stale))
 
     except HTTPException as he:  # ✅ IMPORTANT FIX
         raise he
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.head("/predict/city")
+async def head_predict_by_city(city: str):
+    """Uptime probes: validate the city and report cache headers, no upstream calls."""
+    if city not in CITY_COORDS:
+        return Response(status_code=404)
+    body, max_age = _snapshot_body(city)
+    fallback = (httpcache.make_etag(body), max_age) if body is not None else None
+    return _head_response(("city", city), fallback)
+
+# ---------------- MULTI-CITY PREDICTION ----------------
+def _parse_cities(cities):
+    """?cities=A&cities=B / ?cities=A,B as a de-duplicated list (all cities if empty)."""
+    if cities:
+        names = [c.strip() for item in cities for c in item.split(",") if c.strip()]
+    else:
+        names = list(CITY_COORDS)
+    return list(dict.fromkeys(names))
+
+
+@app.get("/predict/cities")
+async def predict_by_cities(cities: Optional[List[str]] = Query(None)):
+    """
+    Predictions for every city (or ?cities=A&cities=B / ?cities=A,B) in one call.
+    Per-city failures are reported inline instead of failing the batch.
+    """
+    try:
+        names = _parse_cities(cities)
+
+        logger.debug("🔍 API Request for cities: %s", len(names))
+
+        predictions = await predict_cities_async(names)
+
+        results = []
+        for city in names:
+            history, next_day, stale, observed_at = predictions[city]
+            if city not in CITY_COORDS:
+                results.append({"city": city, "error": f"Unknown city: {city}"})
+            elif not history or next_day is None:
+                results.append({"city": city, "error": f"Could not fetch real-time data for {city}"})
+            else:
+                results.append({
+                    "city": city,
+                    "current_aqi": int(history[-1]),
+                    "predicted_next_day": int(next_day),
+                    "health": health_recommendation(next_day),
+                    "stale": stale,
+                    "observed_at": observed_at,
+                })
+
+        failed = sum(1 for r in results if "error" in r)
+        logger.debug("✅ Response: %s ok, %s failed", len(results) - failed, failed)
+        return {"count": len(results), "failed": failed, "results": results}
+
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------- HOURLY FORECAST ----------------
+@app.get("/forecast/city")
+async def forecast_by_city(city: str, request: Request):
+    """Hourly AQI curve and daily min/mean/max from one forecast payload."""
+    resource = ("forecast", city)
+    not_modified = httpcache.check_not_modified(request, resource)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        logger.debug("🔍 API Request for forecast: %s", city)
+
+        hourly, daily, stale = await forecast_city_async(city)
+        if not hourly:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Could not fetch forecast data for {city}"
+            )
+
+        body = {"city": city, "hours": len(hourly), "hourly": hourly, "daily": daily, "stale": stale}
+        return _cached_json(request, resource, body, httpcache.live_max_age(None, stale))
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------- HISTORY ----------------
+def _utc_naive(ts):
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+@app.get("/history")
+async def history(
+    city: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("auto", pattern="^(auto|hour|day|week)$"),
+):
+    """
+    Stored AQI for a city over [start, end) (UTC; default the last 30 days).
+    resolution=auto reads the coarsest rollup table that still gives
+    HISTORY_MAX_POINTS-level detail, so long ranges stay cheap.
+    """
+    if city not in CITY_COORDS:
+        raise HTTPException(status_code=404, detail=f"Unknown city: {city}")
+    if not DATABASE_URL:
+        raise HTTPException(status_code=503, detail="History storage is not configured")
+
+    end = _utc_naive(end) if end is not None else datetime.utcnow()
+    start = _utc_naive(start) if start is not None else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    # Imported lazily: keeps sqlalchemy off the startup path
+    from app.timeseries import query_history
+    try:
+        return await asyncio.to_thread(query_history, city, start, end, resolution)
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # ---------------- GPS PREDICTION ----------------
+def _gps_resource(lat, lon):
+    return ("gps", round(lat, 6), round(lon, 6))
+
+
 @app.get("/predict/gps")
-@app.head("/predict/gps")  # ✅ ADDED
-def predict_by_gps(lat: float = Query(...), lon: float = Query(...)):
+async def predict_by_gps(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+):
+    resource = _gps_resource(lat, lon)
+    not_modified = httpcache.check_not_modified(request, resource)
+    if not_modified is not None:
+        return not_modified
+
     try:
-        print(f"\n🔍 API Request for GPS: {lat}, {lon}")
+        logger.debug("🔍 API Request for GPS: %s, %s", lat, lon)
         
-        city, history, next_day = predict_latlon(lat, lon)
+        city, history, next_day, stale, observed_at = await predict_latlon_async(lat, lon)
 
         # ✅ FIXED CONDITION
         if not history or not city or next_day is None:
@@ -92,17 +391,110 @@ def predict_by_gps(lat: float = Query(...), lon: float = Query(...)):
             "current_aqi": int(current),
             "predicted_next_day": int(next_day),
             "health": health_recommendation(next_day),
+            "stale": stale,
+            "observed_at": observed_at,
         }
         
-        print(f"✅ Response: {response}")
-        return response
+        logger.debug("✅ Response: %s", response)
+        return _cached_json(request, resource, response, httpcache.live_max_age(observed_at, stale))
 
     except HTTPException as he:  # ✅ IMPORTANT FIX
         raise he
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.head("/predict/gps")
+async def head_predict_by_gps(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+):
+    """Uptime probes: report cache headers for the location, no upstream calls."""
+    return _head_response(_gps_resource(lat, lon))
+
+# ---------------- STREAMING ----------------
+def _stream_cities(cities):
+    """Validated city list for a stream; (names, error message)."""
+    names = _parse_cities(cities)
+    unknown = [c for c in names if c not in CITY_COORDS]
+    if unknown:
+        return None, f"Unknown city: {', '.join(unknown)}"
+    return names, None
+
+
+@app.get("/stream/cities")
+async def stream_cities(cities: Optional[List[str]] = Query(None)):
+    """
+    Server-sent events: the current state of each requested city (all by
+    default), then an `aqi` event whenever its AQI or prediction changes.
+    Idle connections get a comment every STREAM_HEARTBEAT_SECONDS.
+    """
+    names, error = _stream_cities(cities)
+    if error:
+        raise HTTPException(status_code=404, detail=error)
+    if hub.full:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers")
+
+    async def events():
+        # Subscribed only once the body is actually streamed, so a response
+        # that is never iterated can't leave a subscriber behind
+        sub = None
+        try:
+            sub = hub.subscribe(names)
+            if sub is None:
+                # Filled up since the check above; the client retries
+                return
+            yield b"retry: 5000\n\n"
+            while True:
+                message = await sub.next(STREAM_HEARTBEAT_SECONDS)
+                yield message.sse if message is not None else b": ping\n\n"
+        finally:
+            if sub is not None:
+                hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: stop nginx-style proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _send_updates(websocket, sub):
+    try:
+        while True:
+            message = await sub.next(STREAM_HEARTBEAT_SECONDS)
+            await websocket.send_text(message.json if message is not None else '{"event":"ping"}')
+    except Exception as e:
+        # Connection closed mid-send; the receive loop notices the disconnect
+        logger.debug("Stream send stopped: %s", e)
+
+
+@app.websocket("/ws/cities")
+async def ws_cities(websocket: WebSocket, cities: Optional[List[str]] = Query(None)):
+    """WebSocket variant of /stream/cities; each text frame is one city update."""
+    await websocket.accept()
+    names, error = _stream_cities(cities)
+    if error:
+        # 1008 policy violation (bad request)
+        await websocket.close(code=1008, reason=error)
+        return
+    sub = hub.subscribe(names)
+    if sub is None:
+        # 1013 try again later
+        await websocket.close(code=1013, reason="Too many stream subscribers")
+        return
+
+    sender = asyncio.create_task(_send_updates(websocket, sub))
+    try:
+        # Incoming frames are ignored; this returns when the client goes away
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(sub)
+
 # ---------------- ROOT ----------------
 @app.get("/")
 @app.head("/")  # ✅ ADDED
@@ -110,16 +502,75 @@ def root():
     return {
         "message": "AQI Backend Running 🚀",
         "status": "Real-Time OpenWeather Integration Active",
-        "endpoints": ["/predict/city", "/predict/gps"]
+        "endpoints": [
+            "/predict/city", "/predict/cities", "/predict/gps", "/forecast/city", "/history",
+            "/stream/cities", "/ws/cities",
+        ]
     }
 
 # ---------------- HEALTH CHECK ----------------
 @app.get("/health")
 @app.head("/health")  # ✅ ADDED
-def health():
+async def health():
+    # Liveness only: no I/O, no thread pool hop
     return {"status": "ok", "mode": "real-time"}
 
+# ---------------- READINESS ----------------
+@app.get("/ready")
+@app.head("/ready")
+async def ready():
+    """
+    200 once warm-up has finished (status "degraded" if a component failed
+    and its fallback is in use), 503 while anything is still loading.
+    """
+    pending = [name for name, state in _warmup.items() if state == "pending"]
+    failed = [name for name, state in _warmup.items() if state == "failed"]
+    body = {
+        "status": "starting" if pending else ("degraded" if failed else "ready"),
+        "components": dict(_warmup),
+        "warmup_seconds": dict(_warmup_seconds),
+        "uptime_seconds": round(time.monotonic() - _started_at, 3),
+        "snapshot_cities": snapshot_status()["cities"],
+    }
+    return JSONResponse(body, status_code=503 if pending else 200)
+
+# ---------------- CACHE STATS ----------------
+def _db_history_stats():
+    if not DATABASE_URL:
+        return None
+    # Imported lazily: sqlalchemy is only needed with a database configured
+    from app.db_manager import history_cache_stats
+    return history_cache_stats()
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        **cache_stats(),
+        "waqi_guard": waqi_guard.stats(),
+        "etag": httpcache.cache_stats(),
+        "shared": get_shared_cache().stats() if get_shared_cache() is not None else None,
+        "db_history": _db_history_stats(),
+        "stream": hub.stats(),
+        "snapshot": snapshot_status(),
+    }
+
+# ---------------- MODEL STATS ----------------
+@app.get("/model/stats")
+def get_model_stats():
+    runner = get_model_runner()
+    if runner is None:
+        return {"loaded": False}
+    return {"loaded": True, **runner.stats()}
+
+# ---------------- METRICS ----------------
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ---------------- RUN ----------------
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
\ No newline at end of file
+    # WEB_WORKERS > 1 starts that many processes sharing the port; they share
+    # caches and the refresher snapshot through SHARED_CACHE_PATH
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=WEB_WORKERS)
\ No newline at end of file